@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import ( Patient, Doctor, MentalState, NightmareMap, AwarenessMap, ChemicalRecipe, MechanicalCompound, MentalStatePreset )
 
-from django.utils.html import format_html
+from .services import avatars as avatars_svc
+from .services import doctors as doctors_svc
 @admin.register(MentalStatePreset)
 class MentalStatePresetAdmin(admin.ModelAdmin):
     list_display = ('level', 'description')
@@ -11,9 +12,14 @@ class MentalStatePresetAdmin(admin.ModelAdmin):
 class PatientAdmin(admin.ModelAdmin):
     list_display = ('avatar_preview', 'full_name', 'nickname', 'telegram', 'chemistry_level', 'mechanics_level', 'social_skills_level', 'mental_state', 'physical_skills_level', 'bonus_level')
     search_fields = ('full_name', 'nickname', 'telegram')
+    def get_search_results(self, request, queryset, search_term):
+        # autocomplete_fields рецептов и приборов ходят сюда; имя и никнейм ищем по триграммным индексам
+        if request.path.endswith('/autocomplete/'):
+            return doctors_svc.filter_patients_by_name(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
     def avatar_preview(self, obj):
         if obj.avatar:
-            return format_html('<img src="{}" style="height:40px;border-radius:50%;" />', obj.avatar.url)
+            return avatars_svc.picture(obj.avatar, 40, 'height:40px;border-radius:50%;')
         return '—'
     avatar_preview.short_description = 'Аватар'
 
@@ -23,7 +29,7 @@ class DoctorAdmin(admin.ModelAdmin):
     search_fields = ('full_name', 'nickname', 'telegram')
     def avatar_preview(self, obj):
         if obj.avatar:
-            return format_html('<img src="{}" style="height:40px;border-radius:50%;" />', obj.avatar.url)
+            return avatars_svc.picture(obj.avatar, 40, 'height:40px;border-radius:50%;')
         return '—'
     avatar_preview.short_description = 'Аватар'
 
@@ -42,16 +48,20 @@ class AwarenessMapAdmin(admin.ModelAdmin):
 
 @admin.register(ChemicalRecipe)
 class ChemicalRecipeAdmin(admin.ModelAdmin):
-    list_display = ('owner', 'author_display', 'property_1', 'property_2', 'property_3', 'duration')
+    list_display = ('owner', 'author_display', 'property_1', 'property_2', 'property_3', 'duration', 'expires_at', 'is_archived')
+    list_filter = ('is_archived',)
     autocomplete_fields = ('owner', 'author_patient', 'author_doctor')
+    list_select_related = ('owner', 'author_patient', 'author_doctor')
     def author_display(self, obj):
         return obj.author_str()
     author_display.short_description = 'Автор'
 
 @admin.register(MechanicalCompound)
 class MechanicalCompoundAdmin(admin.ModelAdmin):
-    list_display = ('owner', 'author_display', 'property_1', 'property_2', 'property_3', 'duration')
+    list_display = ('owner', 'author_display', 'property_1', 'property_2', 'property_3', 'duration', 'expires_at', 'is_archived')
+    list_filter = ('is_archived',)
     autocomplete_fields = ('owner', 'author_patient', 'author_doctor')
+    list_select_related = ('owner', 'author_patient', 'author_doctor')
     def author_display(self, obj):
         return obj.author_str()
     author_display.short_description = 'Автор'
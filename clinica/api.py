@@ -0,0 +1,41 @@
+from rest_framework import permissions, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .services import auth as auth_svc
+from .services import ratelimit as ratelimit_svc
+
+
+class BulkRegisterView(APIView):
+    """ POST /api/clinica/bulk-register/ — массовая регистрация персонажей (только staff). multipart-поле file: CSV или XLSX с колонками nickname, password, full_name, role, telegram """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'File is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = auth_svc.read_registration_file(upload, upload.name)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > auth_svc.BULK_API_MAX_ROWS:
+            return Response({'detail': f'Не больше {auth_svc.BULK_API_MAX_ROWS} строк за запрос; больше — через manage.py bulk_register'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = auth_svc.bulk_register(rows, workers=auth_svc.BULK_API_WORKERS)
+        return Response({
+            'created': result.created,
+            'rows': len(rows),
+            'errors': result.errors,
+            'hash_seconds': round(result.hash_seconds, 3),
+            'insert_seconds': round(result.insert_seconds, 3),
+            'per_second': round(result.per_second, 1),
+        }, status=status.HTTP_201_CREATED if result.created else status.HTTP_400_BAD_REQUEST)
+
+
+class LoginRateLimitStatsView(APIView):
+    """ GET /api/clinica/ratelimit/ — счетчики пропущенных и отклоненных попыток входа (только staff) """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(ratelimit_svc.counters('login'))
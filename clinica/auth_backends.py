@@ -0,0 +1,31 @@
+import copy
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from .services import cache as cache_svc
+
+USER_TTL = 300
+
+
+def user_cache_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+
+def _load_user(user_id):
+    user = get_user_model()._default_manager.filter(pk=user_id).first()
+    if user is not None:
+        # Прогреваем обе обратные связи: найденный профиль (или его отсутствие)
+        # запоминается в экземпляре и уезжает в кэш вместе с ним
+        hasattr(user, 'doctor_profile')
+        hasattr(user, 'patient_profile')
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    # Пользователь сессии вместе с профилем роли берется из кэша, а не из auth_user
+    # и двух таблиц профилей на каждом запросе. Сбрасывается сигналами в signals.py
+    def get_user(self, user_id):
+        user = cache_svc.get_or_compute(user_cache_key(user_id), lambda: _load_user(user_id), USER_TTL)
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        # локальный уровень кэша отдает один и тот же объект — запросу нужна своя копия
+        return copy.deepcopy(user)
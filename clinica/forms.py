@@ -54,4 +54,14 @@ class PatientEditByDoctorForm(forms.ModelForm):
         fields = ['full_name', 'nickname', 'telegram', 'chemistry_level', 'mechanics_level', 'social_skills_level', 'physical_skills_level', 'bonus_level']
 
 class MentalStateDescriptionForm(forms.Form):
-    description = forms.CharField(label='Описание состояния', widget=forms.Textarea, required=False)
\ No newline at end of file
+    description = forms.CharField(label='Описание состояния', widget=forms.Textarea, required=False)
+
+class PatientFilterForm(forms.Form):
+    SKILL_CHOICES = [('', 'Любой')] + [(i, i) for i in range(1, 4)]
+    MENTAL_CHOICES = [('', 'Любое')] + [(i, i) for i in range(-3, 4)]
+    q = forms.CharField(label='Имя, никнейм или Telegram', required=False)
+    chemistry_level = forms.TypedChoiceField(label='Химия', choices=SKILL_CHOICES, coerce=int, empty_value=None, required=False)
+    mechanics_level = forms.TypedChoiceField(label='Механика', choices=SKILL_CHOICES, coerce=int, empty_value=None, required=False)
+    social_skills_level = forms.TypedChoiceField(label='Социальные навыки', choices=SKILL_CHOICES, coerce=int, empty_value=None, required=False)
+    physical_skills_level = forms.TypedChoiceField(label='Физические навыки', choices=SKILL_CHOICES, coerce=int, empty_value=None, required=False)
+    mental_level = forms.TypedChoiceField(label='Ментальное состояние', choices=MENTAL_CHOICES, coerce=int, empty_value=None, required=False)
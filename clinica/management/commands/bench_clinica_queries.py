@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from clinica.models import ChemicalRecipe, Doctor, MechanicalCompound, MentalState, Patient
+from clinica.services import maps as maps_svc
+
+BASELINE = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Считает SQL-запросы на GET каждой страницы clinica: без кэша сессий и пользователя '
+            '(как раньше) и с ним. Данные создаются в транзакции и откатываются.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            patient_user, doctor_user, patient = self._fill()
+            before = self._run(patient_user, doctor_user, patient, BASELINE)
+            after = self._run(patient_user, doctor_user, patient, {})
+            transaction.set_rollback(True)
+        self.stdout.write(f"{'страница':<44} {'до':>4} {'после':>6}")
+        for name in before:
+            self.stdout.write(f'{name:<44} {before[name]:>4} {after[name]:>6}')
+        self.stdout.write(f"{'итого':<44} {sum(before.values()):>4} {sum(after.values()):>6}")
+
+    def _fill(self):
+        patient_user = User.objects.create_user(username='bench_patient')
+        doctor_user = User.objects.create_user(username='bench_doctor')
+        patient = Patient.objects.create(ser=patient_user, full_name='Пациент', nickname='bench_patient', bonus_level='',
+                                         mental_state=MentalState.objects.create(level=0))
+        Doctor.objects.create(user=doctor_user, full_name='Врач', nickname='bench_doctor')
+        maps_svc.get_or_create_awareness(patient)
+        maps_svc.get_or_create_nightmare(patient)
+        for model in (ChemicalRecipe, MechanicalCompound):
+            model.objects.create(owner=patient, author_patient=patient, property_1='1', property_2='2', property_3='3', duration=timedelta(hours=1))
+        return patient_user, doctor_user, patient
+
+    def _urls(self, patient):
+        pid = patient.id
+        patient_urls = ['patient_profile', 'patient_mental_state', 'patient_chemical_recipes', 'patient_mechanical_compounds', 'patient_awareness', 'patient_nightmare']
+        doctor_urls = ['doctor_profile', 'doctor_patients', 'doctor_chemical_recipes', 'doctor_mechanical_compounds']
+        doctor_patient_urls = ['doctor_patient_detail', 'doctor_patient_dossier', 'doctor_patient_mental_history', 'doctor_patient_awareness_edit', 'doctor_patient_nightmare_edit']
+        return ([('patient', name, reverse(f'clinica:{name}')) for name in patient_urls]
+                + [('doctor', name, reverse(f'clinica:{name}')) for name in doctor_urls]
+                + [('doctor', name, reverse(f'clinica:{name}', args=[pid])) for name in doctor_patient_urls]
+                + [('doctor', 'doctor_patient_autocomplete', reverse('clinica:doctor_patient_autocomplete') + '?q=bench')])
+
+    def _run(self, patient_user, doctor_user, patient, overrides):
+        counts = {}
+        with override_settings(**overrides):
+            clients = {'patient': Client(HTTP_HOST='localhost'), 'doctor': Client(HTTP_HOST='localhost')}
+            clients['patient'].force_login(patient_user)
+            clients['doctor'].force_login(doctor_user)
+            for role, name, url in self._urls(patient):
+                # первый запрос прогревает кэши, считаем установившийся режим
+                clients[role].get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = clients[role].get(url)
+                assert response.status_code == 200, (url, response.status_code)
+                counts[name] = len(queries)
+        return counts
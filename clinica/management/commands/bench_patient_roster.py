@@ -0,0 +1,63 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from clinica.models import Doctor, MentalState, Patient
+from clinica.services import pagination
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа списка пациентов врача на синтетических данных разного объема. '
+            'Все данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000,100000')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, sizes='', repeat=20, **options):
+        self.stdout.write(f"{'пациентов':>10} {'сценарий':<24} {'медиана, мс':>12} {'p95, мс':>9}")
+        for size in [int(s) for s in sizes.split(',')]:
+            with transaction.atomic():
+                self._fill(size)
+                for name, url in self._scenarios(size):
+                    timings = self._measure(url, repeat)
+                    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                    self.stdout.write(f'{size:>10} {name:<24} {statistics.median(timings):>12.2f} {p95:>9.2f}')
+                transaction.set_rollback(True)
+
+    def _fill(self, size):
+        states = MentalState.objects.bulk_create([MentalState(level=i % 7 - 3) for i in range(size)], batch_size=5000)
+        Patient.objects.bulk_create([
+            Patient(full_name=f'Пациент {i:06d}', nickname=f'bench_{i}', telegram=f'@bench_{i}', bonus_level='',
+                    chemistry_level=i % 3 + 1, mechanics_level=(i // 3) % 3 + 1, mental_state=ms)
+            for i, ms in enumerate(states)], batch_size=5000)
+        user = User.objects.create_user(username='bench_doctor')
+        Doctor.objects.create(user=user, full_name='Врач', nickname='bench_doctor')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(user)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Patient._meta.db_table}')
+            cursor.execute(f'ANALYZE {MentalState._meta.db_table}')
+
+    def _scenarios(self, size):
+        base = reverse('clinica:doctor_patients')
+        middle = Patient.objects.order_by('full_name', 'id').values_list('full_name', 'id')[size // 2]
+        return [
+            ('первая страница', base),
+            ('середина (курсор)', f'{base}?after={pagination.encode_values(*middle)}'),
+            ('поиск по префиксу', f'{base}?q=Пациент 0001'),
+            ('фильтр: химия', f'{base}?chemistry_level=2'),
+            ('фильтр: ментальное', f'{base}?mental_level=1'),
+        ]
+
+    def _measure(self, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = self.client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+        return timings
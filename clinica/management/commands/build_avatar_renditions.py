@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from clinica.models import Doctor, Patient
+from clinica.services import avatars as avatars_svc
+
+
+class Command(BaseCommand):
+    help = 'Строит копии аватаров (40/128/512, WebP и JPEG) для загруженных до их появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перестроить и те, у которых копии уже есть')
+
+    def handle(self, *args, force=False, **options):
+        built = failed = 0
+        for model in (Patient, Doctor):
+            for contact in model.objects.exclude(avatar__isnull=True).exclude(avatar='').only('pk', 'avatar').iterator():
+                if not force and avatars_svc.urls(contact.avatar):
+                    continue
+                if avatars_svc.build(contact.avatar):
+                    built += 1
+                else:
+                    failed += 1
+        self.stdout.write(self.style.SUCCESS(f'Построено: {built}, ошибок: {failed}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from clinica.services import mental_state as ms_svc
+
+
+class Command(BaseCommand):
+    help = 'Разносит описания из справочника MentalStatePreset по всем ментальным состояниям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--level', type=int, action='append', dest='levels', help='Только указанные уровни (можно несколько раз)')
+        parser.add_argument('--batch-size', type=int, default=ms_svc.PROPAGATE_BATCH_SIZE)
+
+    def handle(self, *args, levels=None, batch_size=None, **options):
+        touched = ms_svc.propagate_presets(levels=levels, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено строк: {touched}'))
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from clinica.models import ChemicalRecipe, MechanicalCompound
+from clinica.services import compounds as compounds_svc
+
+
+class Command(BaseCommand):
+    help = 'Архивирует истекшие химические рецепты и механические соединения (запускать по cron или с --every)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=compounds_svc.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--every', type=int, default=0, help='Повторять каждые N секунд вместо однократного запуска')
+
+    def handle(self, *args, batch_size=None, every=0, **options):
+        while True:
+            for model in (ChemicalRecipe, MechanicalCompound):
+                archived = compounds_svc.archive_expired(model, batch_size=batch_size)
+                self.stdout.write(f'{model._meta.verbose_name_plural}: в архив {archived}')
+            if not every:
+                return
+            time.sleep(every)
@@ -1,11 +1,20 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.shortcuts import redirect
 from . import views as clinica_views
 from django.urls import reverse
 
 class LoginRequiredMiddleware:
+    # Умеет работать в обоих режимах: под ASGI не переводит всю цепочку в поток
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # async-версия — иначе Django оборачивает process_view в sync_to_async на каждом запросе
+            self.process_view = self.aprocess_view
         # Публичные вьюхи (без авторизации)
         self.public_views = {
             clinica_views.login_view,
@@ -14,28 +23,40 @@ class LoginRequiredMiddleware:
         }
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         return self.get_response(request)
 
-    def process_view(self, request, view_func, view_args, view_kwargs):
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def _exempt(self, request, view_func):
         path = request.path_info
 
         # Разрешаем статику/медиа
         if settings.STATIC_URL and path.startswith(settings.STATIC_URL):
-            return None
+            return True
         if settings.MEDIA_URL and path.startswith(settings.MEDIA_URL):
-            return None
+            return True
+
+        # Вьюхи с собственной JWT-аутентификацией (tasks.async_views)
+        if getattr(view_func, 'jwt_authenticated', False):
+            return True
 
         # Разрешаем админку
         if path.startswith('/admin/'):
-            return None
+            return True
 
-        # Уже авторизован — пропускаем всё
-        if request.user.is_authenticated:
-            return None
+        # Неавторизованным доступны только публичные вьюхи
+        return view_func in self.public_views
 
-        # Неавторизован: пропускаем только публичные вьюхи
-        if view_func in self.public_views:
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self._exempt(request, view_func) or request.user.is_authenticated:
             return None
-
         # Остальное — редирект на логин
-        return redirect(reverse('clinica:login'))
\ No newline at end of file
+        return redirect(reverse('clinica:login'))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self._exempt(request, view_func) or (await request.auser()).is_authenticated:
+            return None
+        return redirect(reverse('clinica:login'))
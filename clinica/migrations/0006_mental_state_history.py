@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:00
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0005_mentalstatepreset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentalStateHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало интервала')),
+                ('min_level', models.SmallIntegerField(verbose_name='Минимум')),
+                ('max_level', models.SmallIntegerField(verbose_name='Максимум')),
+                ('level_sum', models.IntegerField(verbose_name='Сумма уровней')),
+                ('samples', models.IntegerField(verbose_name='Число изменений')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinica.patient', verbose_name='Пациент')),
+            ],
+            options={
+                'verbose_name': 'Ментальное состояние за час',
+                'verbose_name_plural': 'Ментальное состояние по часам',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MentalStateMinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало интервала')),
+                ('min_level', models.SmallIntegerField(verbose_name='Минимум')),
+                ('max_level', models.SmallIntegerField(verbose_name='Максимум')),
+                ('level_sum', models.IntegerField(verbose_name='Сумма уровней')),
+                ('samples', models.IntegerField(verbose_name='Число изменений')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinica.patient', verbose_name='Пациент')),
+            ],
+            options={
+                'verbose_name': 'Ментальное состояние за минуту',
+                'verbose_name_plural': 'Ментальное состояние по минутам',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MentalStateEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.SmallIntegerField(validators=[django.core.validators.MinValueValidator(-3), django.core.validators.MaxValueValidator(3)], verbose_name='Уровень')),
+                ('created_at', models.DateTimeField(verbose_name='Время')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mental_state_events', to='clinica.patient', verbose_name='Пациент')),
+            ],
+            options={
+                'verbose_name': 'Изменение ментального состояния',
+                'verbose_name_plural': 'История ментальных состояний',
+                'indexes': [models.Index(fields=['patient', 'created_at'], name='clinica_msevent_patient_time')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mentalstatehourrollup',
+            constraint=models.UniqueConstraint(fields=('patient', 'bucket'), name='clinica_mentalstatehourrollup_patient_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='mentalstateminuterollup',
+            constraint=models.UniqueConstraint(fields=('patient', 'bucket'), name='clinica_mentalstateminuterollup_patient_bucket'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0006_mental_state_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chemicalrecipe',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='clinica_chem_owner_created'),
+        ),
+        migrations.AddIndex(
+            model_name='chemicalrecipe',
+            index=models.Index(fields=['-created_at', '-id'], name='clinica_chem_created'),
+        ),
+        migrations.AddIndex(
+            model_name='mechanicalcompound',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='clinica_mech_owner_created'),
+        ),
+        migrations.AddIndex(
+            model_name='mechanicalcompound',
+            index=models.Index(fields=['-created_at', '-id'], name='clinica_mech_created'),
+        ),
+    ]
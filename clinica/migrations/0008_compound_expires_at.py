@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_expires_at(apps, schema_editor):
+    for name in ('ChemicalRecipe', 'MechanicalCompound'):
+        apps.get_model('clinica', name).objects.update(expires_at=F('created_at') + F('duration'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0007_compound_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chemicalrecipe',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Действует до'),
+        ),
+        migrations.AddField(
+            model_name='chemicalrecipe',
+            name='is_archived',
+            field=models.BooleanField(default=False, verbose_name='В архиве'),
+        ),
+        migrations.AddField(
+            model_name='mechanicalcompound',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Действует до'),
+        ),
+        migrations.AddField(
+            model_name='mechanicalcompound',
+            name='is_archived',
+            field=models.BooleanField(default=False, verbose_name='В архиве'),
+        ),
+        migrations.RunPython(fill_expires_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chemicalrecipe',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', 'expires_at'], name='clinica_chem_active'),
+        ),
+        migrations.AddIndex(
+            model_name='mechanicalcompound',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', 'expires_at'], name='clinica_mech_active'),
+        ),
+    ]
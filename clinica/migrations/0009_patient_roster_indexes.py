@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:30
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0008_compound_expires_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mentalstate',
+            index=models.Index(fields=['level'], name='clinica_mentalstate_level'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['full_name', 'id'], name='clinica_patient_name'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['chemistry_level', 'full_name', 'id'], name='clinica_patient_chem'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['mechanics_level', 'full_name', 'id'], name='clinica_patient_mech'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['social_skills_level', 'full_name', 'id'], name='clinica_patient_social'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['physical_skills_level', 'full_name', 'id'], name='clinica_patient_phys'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('full_name'), name='text_pattern_ops'), name='clinica_patient_name_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nickname'), name='text_pattern_ops'), name='clinica_patient_nick_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('telegram'), name='text_pattern_ops'), name='clinica_patient_tg_prefix'),
+        ),
+    ]
@@ -3,7 +3,10 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator, FileExtensionValidator
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.db.models import Q
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 def avatar_upload_to(instance, filename):
@@ -39,6 +42,8 @@ class MentalStatePreset(models.Model):
 class MentalState(TimeStampedModel):
     level = models.SmallIntegerField( 'Уровень ментального состояния', validators=[MinValueValidator(-3), MaxValueValidator(3)], default=0 )
     description = models.TextField('Описание состояния', blank=True)
+    class Meta:
+        indexes = [models.Index(fields=['level'], name='clinica_mentalstate_level')]
     def __str__(self):
         return f'Ментальное состояние {self.level}'
 
@@ -52,9 +57,60 @@ class Patient(ContactBase, TimeStampedModel):
     bonus_level = models.TextField( 'Дополнительные свойства')
     mental_state = models.OneToOneField(MentalState, on_delete=models.CASCADE, null=True, blank=True,
                                         related_name='patient', verbose_name='Ментальное состояние')
+    class Meta:
+        indexes = [
+            # список врача: сортировка и курсор по (full_name, id), в т.ч. внутри фильтра по навыку
+            models.Index(fields=['full_name', 'id'], name='clinica_patient_name'),
+            models.Index(fields=['chemistry_level', 'full_name', 'id'], name='clinica_patient_chem'),
+            models.Index(fields=['mechanics_level', 'full_name', 'id'], name='clinica_patient_mech'),
+            models.Index(fields=['social_skills_level', 'full_name', 'id'], name='clinica_patient_social'),
+            models.Index(fields=['physical_skills_level', 'full_name', 'id'], name='clinica_patient_phys'),
+            # поиск по префиксу без учета регистра (istartswith -> UPPER(...) LIKE 'ABC%')
+            models.Index(OpClass(Upper('full_name'), name='text_pattern_ops'), name='clinica_patient_name_prefix'),
+            models.Index(OpClass(Upper('nickname'), name='text_pattern_ops'), name='clinica_patient_nick_prefix'),
+            models.Index(OpClass(Upper('telegram'), name='text_pattern_ops'), name='clinica_patient_tg_prefix'),
+            # подстрочный поиск для автодополнения (icontains -> UPPER(...) LIKE '%ABC%'), нужен pg_trgm
+            GinIndex(OpClass(Upper('full_name'), name='gin_trgm_ops'), name='clinica_patient_name_trgm'),
+            GinIndex(OpClass(Upper('nickname'), name='gin_trgm_ops'), name='clinica_patient_nick_trgm'),
+        ]
     def __str__(self):
         return f'Пациент {self.full_name} (@{self.nickname})'
 
+class MentalStateEvent(models.Model):
+    # Журнал изменений уровня: только вставки, пишутся из services/mental_history в транзакции изменения
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='mental_state_events', verbose_name='Пациент')
+    level = models.SmallIntegerField('Уровень', validators=[MinValueValidator(-3), MaxValueValidator(3)])
+    created_at = models.DateTimeField('Время')
+    class Meta:
+        verbose_name = 'Изменение ментального состояния'
+        verbose_name_plural = 'История ментальных состояний'
+        indexes = [models.Index(fields=['patient', 'created_at'], name='clinica_msevent_patient_time')]
+
+class MentalStateRollup(models.Model):
+    # Агрегат уровня за интервал bucket; поддерживается инкрементально при записи событий
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='+', verbose_name='Пациент')
+    bucket = models.DateTimeField('Начало интервала')
+    min_level = models.SmallIntegerField('Минимум')
+    max_level = models.SmallIntegerField('Максимум')
+    level_sum = models.IntegerField('Сумма уровней')
+    samples = models.IntegerField('Число изменений')
+    class Meta:
+        abstract = True
+        constraints = [models.UniqueConstraint(fields=['patient', 'bucket'], name='%(app_label)s_%(class)s_patient_bucket')]
+    @property
+    def avg_level(self):
+        return self.level_sum / self.samples if self.samples else None
+
+class MentalStateMinuteRollup(MentalStateRollup):
+    class Meta(MentalStateRollup.Meta):
+        verbose_name = 'Ментальное состояние за минуту'
+        verbose_name_plural = 'Ментальное состояние по минутам'
+
+class MentalStateHourRollup(MentalStateRollup):
+    class Meta(MentalStateRollup.Meta):
+        verbose_name = 'Ментальное состояние за час'
+        verbose_name_plural = 'Ментальное состояние по часам'
+
 class Doctor(ContactBase, TimeStampedModel):
     # Опционально: связать врача с учетной записью пользователя для реальных прав доступа
     user = models.OneToOneField(
@@ -145,6 +201,9 @@ class AbstractCompound(TimeStampedModel):
     property_3 = models.CharField('Свойство 3', max_length=255)
     duration = models.DurationField('Время действия')
     extra_property = models.CharField('Доп. свойство', max_length=255, blank=True)
+    # created_at + duration; пересчитывается в save(), пачками архивируется sweep_expired_compounds
+    expires_at = models.DateTimeField('Действует до', null=True, blank=True, editable=False)
+    is_archived = models.BooleanField('В архиве', default=False)
     class Meta:
         abstract = True
         constraints = [
@@ -159,6 +218,18 @@ class AbstractCompound(TimeStampedModel):
         super().clean()
         if bool(self.author_patient) == bool(self.author_doctor):
             raise ValidationError('Укажите либо автора-пациента, либо автора-врача (ровно одно поле).')
+    def save(self, *args, **kwargs):
+        self.expires_at = (self.created_at or timezone.now()) + self.duration
+        # продленный состав снова действует — возвращаем его из архива
+        if self.is_archived and self.expires_at > timezone.now():
+            self.is_archived = False
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'duration' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'expires_at', 'is_archived'}
+        super().save(*args, **kwargs)
+    @property
+    def is_active(self):
+        return not self.is_archived and self.expires_at is not None and self.expires_at > timezone.now()
     @property
     def author(self):
         return self.author_patient or self.author_doctor
@@ -175,6 +246,11 @@ class ChemicalRecipe(AbstractCompound):
     class Meta:
         verbose_name = 'Химический рецепт'
         verbose_name_plural = 'Химические рецепты'
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='clinica_chem_owner_created'),
+            models.Index(fields=['-created_at', '-id'], name='clinica_chem_created'),
+            models.Index(fields=['owner', 'expires_at'], condition=Q(is_archived=False), name='clinica_chem_active'),
+        ]
     def __str__(self):
         return f'Химический рецепт для {self.owner.full_name} (авт. {self.author_str()})'
 
@@ -182,5 +258,10 @@ class MechanicalCompound(AbstractCompound):
     class Meta:
         verbose_name = 'Механическое соединение'
         verbose_name_plural = 'Механические соединения'
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='clinica_mech_owner_created'),
+            models.Index(fields=['-created_at', '-id'], name='clinica_mech_created'),
+            models.Index(fields=['owner', 'expires_at'], condition=Q(is_archived=False), name='clinica_mech_active'),
+        ]
     def __str__(self):
         return f'Механическое соединение для {self.owner.full_name} (авт. {self.author_str()})'
@@ -1,7 +1,20 @@
+import csv
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Iterable, List, Optional
 from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User, Permission
 from django.db import transaction
 from ..models import Patient, Doctor, MentalState, AwarenessMap, NightmareMap
+from . import doctors as doctors_svc
+from . import hashing
+from . import presets as presets_svc
 
 def authenticate_by_nickname(nickname: str, password: str):
     return authenticate(username=nickname, password=password)
@@ -12,12 +25,10 @@ def register_user(nickname: str, password: str, full_name: str, role: str, teleg
         raise ValueError('Никнейм уже занят')
     user = User.objects.create_user(username=nickname, password=password)
     if role == 'patient':
+        ms = MentalState.objects.create(level=0, description=presets_svc.get_description(0) or '')
         patient = Patient.objects.create(
-            user=user, full_name=full_name, nickname=nickname, telegram=telegram or ''
+            ser=user, full_name=full_name, nickname=nickname, telegram=telegram or '', mental_state=ms
         )
-        ms = MentalState.objects.create(level=0, description='')
-        patient.mental_state = ms
-        patient.save()
         AwarenessMap.objects.create(patient=patient)
         NightmareMap.objects.create(patient=patient)
     elif role == 'doctor':
@@ -30,4 +41,143 @@ def register_user(nickname: str, password: str, full_name: str, role: str, teleg
             pass
     else:
         raise ValueError('Неизвестная роль')
-    return user
\ No newline at end of file
+    return user
+
+
+# Массовая регистрация персонажей перед игрой
+BULK_COLUMNS = ('nickname', 'password', 'full_name', 'role', 'telegram')
+BULK_BATCH_SIZE = 500
+# Через API хешируем скромно, чтобы запрос уложился в таймаут воркера (~0.3 с на пароль);
+# большие списки — через manage.py bulk_register
+BULK_API_WORKERS = 2
+BULK_API_MAX_ROWS = 300
+
+
+@dataclass
+class BulkRegistrationResult:
+    created: int = 0
+    errors: List[str] = field(default_factory=list)
+    hash_seconds: float = 0.0
+    insert_seconds: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        total = self.hash_seconds + self.insert_seconds
+        return self.created / total if total else 0.0
+
+
+_EXTRA = '__extra__'
+
+
+def read_registration_file(fileobj: IO[bytes], filename: str) -> List[dict]:
+    # CSV (UTF-8, с заголовком) или XLSX (первый лист, первая строка — заголовок).
+    # Битый файл — ValueError, как и прочие ошибки ввода в этом модуле
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+        try:
+            sheet = load_workbook(fileobj, read_only=True, data_only=True).active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(c or '').strip().lower() for c in next(rows, ())]
+            return [{h: '' if v is None else str(v).strip() for h, v in zip(header, row)} for row in rows if any(row)]
+        except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as e:
+            raise ValueError(f'Не удалось прочитать XLSX: {e}')
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig')
+    rows, broken = [], []
+    try:
+        # лишние значения уходят под _EXTRA, недостающие приходят как None — такие строки не угадываем
+        reader = csv.DictReader(text, restkey=_EXTRA, restval=None)
+        for row in reader:
+            if _EXTRA in row or None in row.values():
+                count = sum(v is not None for k, v in row.items() if k != _EXTRA) + len(row.get(_EXTRA, ()))
+                broken.append(f'Строка {reader.line_num}: полей {count}, в заголовке {len(reader.fieldnames)}')
+                continue
+            rows.append({(k or '').strip().lower(): v.strip() for k, v in row.items()})
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f'Не удалось прочитать CSV: {e}')
+    if broken:
+        raise ValueError('; '.join(broken))
+    return rows
+
+
+def _max_lengths(role: str) -> dict:
+    # Ограничения колонок берем из моделей: длинное значение иначе уронит bulk_create с DataError
+    model = Patient if role == 'patient' else Doctor
+    return {
+        'nickname': min(User._meta.get_field('username').max_length, model._meta.get_field('nickname').max_length),
+        'full_name': model._meta.get_field('full_name').max_length,
+        'telegram': model._meta.get_field('telegram').max_length,
+    }
+
+
+def _validate(rows: Iterable[dict], result: BulkRegistrationResult) -> List[dict]:
+    valid, seen = [], set()
+    for num, row in enumerate(rows, start=2):
+        nickname, role = row.get('nickname', ''), row.get('role', '')
+        if not nickname or not row.get('password') or not row.get('full_name'):
+            result.errors.append(f'Строка {num}: нужны nickname, password и full_name')
+        elif role not in ('patient', 'doctor'):
+            result.errors.append(f'Строка {num}: неизвестная роль «{role}»')
+        elif too_long := [c for c, limit in _max_lengths(role).items() if len(row.get(c) or '') > limit]:
+            result.errors.append(f'Строка {num}: слишком длинное значение в {", ".join(too_long)}')
+        elif nickname in seen:
+            result.errors.append(f'Строка {num}: никнейм {nickname} повторяется в файле')
+        else:
+            seen.add(nickname)
+            valid.append(row)
+    taken = set()
+    for model, column in ((User, 'username'), (Patient, 'nickname'), (Doctor, 'nickname')):
+        taken.update(model.objects.filter(**{f'{column}__in': seen}).values_list(column, flat=True))
+    for nickname in sorted(taken):
+        result.errors.append(f'Никнейм {nickname} уже занят')
+    return [row for row in valid if row['nickname'] not in taken]
+
+
+def bulk_register(rows: Iterable[dict], *, workers: Optional[int] = None, batch_size: int = BULK_BATCH_SIZE) -> BulkRegistrationResult:
+    # Пароли хешируются параллельно в пуле процессов (PBKDF2 упирается в CPU),
+    # затем каждая таблица заполняется несколькими большими bulk_create в одной транзакции.
+    # Процессы запускаются через spawn: fork из воркера с фоновыми потоками (подписки Redis)
+    # может унаследовать захваченные ими блокировки
+    result = BulkRegistrationResult()
+    rows = _validate(rows, result)
+    if not rows:
+        return result
+
+    start = time.perf_counter()
+    passwords = [row['password'] for row in rows]
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=hashing.init_worker,
+                             initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'mobius_clinica.settings'),)) as pool:
+        hashes = list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+    result.hash_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [User(username=row['nickname'], password=hashed) for row, hashed in zip(rows, hashes)], batch_size=batch_size)
+        patient_rows = [(row, user) for row, user in zip(rows, users) if row['role'] == 'patient']
+        doctor_rows = [(row, user) for row, user in zip(rows, users) if row['role'] == 'doctor']
+
+        ms_description = presets_svc.get_description(0) or ''
+        states = MentalState.objects.bulk_create(
+            [MentalState(level=0, description=ms_description) for _ in patient_rows], batch_size=batch_size)
+        patients = Patient.objects.bulk_create([
+            Patient(ser=user, full_name=row['full_name'], nickname=row['nickname'], telegram=row.get('telegram', ''),
+                    bonus_level='', mental_state=ms)
+            for (row, user), ms in zip(patient_rows, states)], batch_size=batch_size)
+        AwarenessMap.objects.bulk_create([AwarenessMap(patient=p) for p in patients], batch_size=batch_size)
+        NightmareMap.objects.bulk_create([NightmareMap(patient=p) for p in patients], batch_size=batch_size)
+
+        Doctor.objects.bulk_create([
+            Doctor(user=user, full_name=row['full_name'], nickname=row['nickname'], telegram=row.get('telegram', ''))
+            for row, user in doctor_rows], batch_size=batch_size)
+        perm = Permission.objects.filter(codename='can_edit_patients').first()
+        if perm is not None:
+            through = User.user_permissions.through
+            through.objects.bulk_create([through(user_id=user.id, permission_id=perm.id) for _, user in doctor_rows], batch_size=batch_size)
+    result.insert_seconds = time.perf_counter() - start
+    result.created = len(users)
+
+    # bulk_create не шлет post_save — сбрасываем кэш автодополнения вручную
+    doctors_svc.invalidate_autocomplete()
+    return result
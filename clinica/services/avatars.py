@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.utils.html import format_html
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Уменьшенные копии аватара: квадраты SIZES в WebP и JPEG рядом с оригиналом,
+# avatars/<model>/renditions/<имя>_<хеш>_<размер>.<ext>. Имена выводятся из полного имени
+# оригинала (хеш различает photo.jpg и photo.png), поэтому отдельных полей в моделях не нужно
+SIZES = (40, 128, 512)
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+QUALITY = 82
+URLS_TTL = 24 * 60 * 60
+
+
+def _digest(name: str) -> str:
+    return hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+
+
+def rendition_name(name: str, size: int, ext: str) -> str:
+    directory, filename = os.path.split(os.path.splitext(name)[0])
+    return f'{directory}/renditions/{filename}_{_digest(name)[:12]}_{size}.{ext}'
+
+
+def _urls_key(name: str) -> str:
+    return f'avatar:urls:{_digest(name)}'
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        # у JPEG нет прозрачности — кладем на белый фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    if fmt == 'JPEG':
+        image.save(buffer, fmt, quality=QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, fmt, quality=QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def build(field_file) -> bool:
+    # Вызывается при загрузке нового аватара; при ошибке остается оригинал
+    if not field_file:
+        return False
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as f, Image.open(f) as original:
+            # для JPEG декодируем сразу в уменьшенном масштабе — большие фото не разворачиваются целиком
+            original.draft('RGB', (max(SIZES), max(SIZES)))
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        for size in SIZES:
+            thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            for ext, fmt in FORMATS.items():
+                name = rendition_name(field_file.name, size, ext)
+                if storage.exists(name):
+                    storage.delete(name)
+                storage.save(name, ContentFile(_encode(thumb, fmt)))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Не удалось построить копии аватара %s', field_file.name, exc_info=True)
+        return False
+    finally:
+        cache.delete(_urls_key(field_file.name))
+    return True
+
+
+def delete(storage, name: str) -> None:
+    if not name:
+        return
+    for size in SIZES:
+        for ext in FORMATS:
+            storage.delete(rendition_name(name, size, ext))
+    cache.delete(_urls_key(name))
+
+
+def urls(field_file) -> dict:
+    # {(размер, ext): url}; пустой словарь — копий нет (аватар загружен до их появления)
+    if not field_file:
+        return {}
+    key = _urls_key(field_file.name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    storage = field_file.storage
+    names = {(size, ext): rendition_name(field_file.name, size, ext) for size in SIZES for ext in FORMATS}
+    result = {}
+    if all(storage.exists(name) for name in names.values()):
+        result = {k: storage.url(name) for k, name in names.items()}
+    cache.set(key, result, URLS_TTL)
+    return result
+
+
+def picture(field_file, size: int, style: str = ''):
+    # <picture> с WebP и JPEG нужного размера; без копий — оригинал, как раньше
+    if not field_file:
+        return ''
+    size = min((s for s in SIZES if s >= size), default=SIZES[-1])
+    found = urls(field_file)
+    if not found:
+        return format_html('<img src="{}" style="{}" alt="">', field_file.url, style)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"><img src="{}" style="{}" alt="" loading="lazy"></picture>',
+        found[(size, 'webp')], found[(size, 'jpg')], style)
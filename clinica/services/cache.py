@@ -0,0 +1,209 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Сколько живет блокировка пересчета (на случай, если воркер упал посреди сборки)
+LOCK_TTL = 10
+# Сколько ждем чужой пересчет при полном промахе, прежде чем собрать сами
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+# После логического истечения запись еще STALE_GRACE секунд лежит в Redis,
+# чтобы пока один воркер пересобирает данные, остальные отдавали устаревшее значение
+STALE_GRACE = 60
+# Коэффициент вероятностного раннего обновления (XFetch): >1 — обновлять раньше
+EARLY_BETA = 1.0
+
+# Локальный (в памяти воркера) уровень перед Redis
+LOCAL_MAX_ENTRIES = 1024
+LOCAL_TTL = 30
+INVALIDATION_CHANNEL = 'clinica:cache:invalidate'
+RECONNECT_DELAY = 5
+
+_MISSING = object()
+
+
+class _LocalLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            value, expiry = item
+            if expiry <= time.time():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expiry: float, generation: int) -> None:
+        with self._lock:
+            # Пока мы ходили в Redis, могла прилететь инвалидация — тогда не кладем
+            if generation != self.generation:
+                return
+            self._data[key] = (value, expiry)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+_local = _LocalLRU(LOCAL_MAX_ENTRIES)
+# Локальный уровень включен только пока жив подписчик на канал инвалидации,
+# иначе воркер мог бы не узнать об изменениях, сделанных другими воркерами
+_listener_ready = threading.Event()
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _redis():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        # Бэкенд кэша не django_redis (например, в тестах) — работаем без локального уровня
+        return None
+
+
+def _listen() -> None:
+    while True:
+        conn = _redis()
+        if conn is None:
+            return
+        pubsub = conn.pubsub()
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Дожидаемся подтверждения подписки, до этого сообщения могли бы потеряться
+            while pubsub.get_message(timeout=RECONNECT_DELAY) is None:
+                pass
+            _listener_ready.set()
+            for message in pubsub.listen():
+                if message['type'] == 'message':
+                    _local.pop(message['data'].decode())
+        except Exception:
+            logger.warning('Подписка на %s потеряна, локальный кэш отключен', INVALIDATION_CHANNEL, exc_info=True)
+        finally:
+            _listener_ready.clear()
+            _local.clear()
+            pubsub.close()
+        time.sleep(RECONNECT_DELAY)
+
+
+def _ensure_listener() -> None:
+    # Поток запускается лениво в каждом процессе: после fork gunicorn потоки мастера не наследуются
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        _listener_ready.clear()
+        _local.clear()
+        threading.Thread(target=_listen, name='clinica-cache-invalidation', daemon=True).start()
+
+
+def _lock_key(key: str) -> str:
+    return f'{key}:lock'
+
+
+def _should_refresh(delta: float, expiry: float, now: float) -> bool:
+    # Чем ближе к expiry и чем дольше сборка (delta), тем выше шанс обновить заранее.
+    # 1 - random() лежит в (0, 1], поэтому log не упадет на нуле
+    return now - delta * EARLY_BETA * math.log(1.0 - random.random()) >= expiry
+
+
+def _recompute(key: str, builder: Callable[[], Any], ttl: int) -> tuple:
+    try:
+        start = time.time()
+        value = builder()
+        now = time.time()
+        cache.set(key, (value, now - start, now + ttl), ttl + STALE_GRACE)
+        return value, now + ttl
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _entry(key: str):
+    # Запись — (значение, время сборки, логический срок). Все остальное (например, голые
+    # значения, оставшиеся в Redis от прежнего формата) считаем промахом и пересобираем
+    entry = cache.get(key)
+    if isinstance(entry, tuple) and len(entry) == 3 and all(isinstance(x, (int, float)) for x in entry[1:]):
+        return entry
+    return None
+
+
+def _get_or_compute_remote(key: str, builder: Callable[[], Any], ttl: int) -> tuple:
+    entry = _entry(key)
+    now = time.time()
+    if entry is not None:
+        value, delta, expiry = entry
+        if not _should_refresh(delta, expiry, now):
+            return value, expiry
+        # Пора обновлять: пересобирает только тот, кто взял блокировку,
+        # остальные сразу получают текущее (возможно, устаревшее) значение
+        if cache.add(_lock_key(key), 1, LOCK_TTL):
+            return _recompute(key, builder, ttl)
+        return value, now
+
+    # Полный промах (первое обращение или инвалидация)
+    if cache.add(_lock_key(key), 1, LOCK_TTL):
+        return _recompute(key, builder, ttl)
+    deadline = now + LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = _entry(key)
+        if entry is not None:
+            return entry[0], entry[2]
+    # Не дождались — собираем сами, но в кэш не пишем, чтобы не перетереть чужой результат
+    return builder(), now
+
+
+def get_or_compute(key: str, builder: Callable[[], Any], ttl: int) -> Any:
+    _ensure_listener()
+    if not _listener_ready.is_set():
+        return _get_or_compute_remote(key, builder, ttl)[0]
+    value = _local.get(key)
+    if value is not _MISSING:
+        return value
+    generation = _local.generation
+    value, expiry = _get_or_compute_remote(key, builder, ttl)
+    # Локально держим не дольше LOCAL_TTL и не дольше логического срока в Redis,
+    # чтобы раннее обновление продолжало срабатывать
+    _local.set(key, value, min(time.time() + LOCAL_TTL, expiry), generation)
+    return value
+
+
+def invalidate(key: str) -> None:
+    _local.pop(key)
+    cache.delete(key)
+    conn = _redis()
+    if conn is None:
+        return
+    try:
+        conn.publish(INVALIDATION_CHANNEL, key)
+    except Exception:
+        logger.warning('Не удалось разослать инвалидацию %s', key, exc_info=True)
@@ -1,17 +1,41 @@
-from typing import Iterable
+from typing import Iterable, Optional
+from django.db.models import CharField, F, Q, Value
+from django.utils import timezone
 from ..models import Patient, Doctor, ChemicalRecipe, MechanicalCompound
+from . import pagination
 
 def list_patient_chemical(patient: Patient) -> Iterable[ChemicalRecipe]:
-    return ChemicalRecipe.objects.filter(owner=patient).order_by('-created_at')
+    return ChemicalRecipe.objects.filter(owner=patient).select_related('author_patient', 'author_doctor').order_by('-created_at', '-id')
 
 def list_patient_mechanical(patient: Patient) -> Iterable[MechanicalCompound]:
-    return MechanicalCompound.objects.filter(owner=patient).order_by('-created_at')
+    return MechanicalCompound.objects.filter(owner=patient).select_related('author_patient', 'author_doctor').order_by('-created_at', '-id')
 
 def list_all_chemical() -> Iterable[ChemicalRecipe]:
-    return ChemicalRecipe.objects.select_related('owner').order_by('-created_at')
+    return ChemicalRecipe.objects.select_related('owner', 'author_patient', 'author_doctor').order_by('-created_at', '-id')
 
 def list_all_mechanical() -> Iterable[MechanicalCompound]:
-    return MechanicalCompound.objects.select_related('owner').order_by('-created_at')
+    return MechanicalCompound.objects.select_related('owner', 'author_patient', 'author_doctor').order_by('-created_at', '-id')
+
+def list_active_chemical(patient: Patient) -> Iterable[ChemicalRecipe]:
+    # идет по частичному индексу (owner, expires_at) WHERE NOT is_archived
+    return ChemicalRecipe.objects.filter(owner=patient, is_archived=False, expires_at__gt=timezone.now()).select_related('author_patient', 'author_doctor').order_by('expires_at')
+
+def list_active_mechanical(patient: Patient) -> Iterable[MechanicalCompound]:
+    return MechanicalCompound.objects.filter(owner=patient, is_archived=False, expires_at__gt=timezone.now()).select_related('author_patient', 'author_doctor').order_by('expires_at')
+
+ARCHIVE_BATCH_SIZE = 1000
+
+def archive_expired(model, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    # Помечает истекшие записи архивными пачками по batch_size, чтобы не держать
+    # длинных блокировок; активный индекс от этого только уменьшается
+    now = timezone.now()
+    expired = model.objects.filter(is_archived=False, expires_at__lte=now).order_by('id').values('id')[:batch_size]
+    total = 0
+    while True:
+        archived = model.objects.filter(id__in=expired).update(is_archived=True)
+        total += archived
+        if archived < batch_size:
+            return total
 
 def create_patient_chemical(patient: Patient, *, property_1: str, property_2: str, property_3: str, duration, extra_property: str = '') -> ChemicalRecipe:
     return ChemicalRecipe.objects.create( owner=patient, author_patient=patient, property_1=property_1, property_2=property_2, property_3=property_3, duration=duration, extra_property=extra_property or '' )
@@ -23,4 +47,53 @@ def create_doctor_chemical(doctor: Doctor, owner: Patient, *, property_1: str, p
     return ChemicalRecipe.objects.create( owner=owner, author_doctor=doctor, property_1=property_1, property_2=property_2, property_3=property_3, duration=duration, extra_property=extra_property or '' )
 
 def create_doctor_mechanical(doctor: Doctor, owner: Patient, *, property_1: str, property_2: str, property_3: str, duration, extra_property: str = '') -> MechanicalCompound:
-    return MechanicalCompound.objects.create( owner=owner, author_doctor=doctor, property_1=property_1, property_2=property_2, property_3=property_3, duration=duration, extra_property=extra_property or '' )
\ No newline at end of file
+    return MechanicalCompound.objects.create( owner=owner, author_doctor=doctor, property_1=property_1, property_2=property_2, property_3=property_3, duration=duration, extra_property=extra_property or '' )
+
+FEED_FIELDS = ('kind', 'id', 'created_at', 'expires_at', 'owner_id', 'owner_name', 'author_patient_name', 'author_doctor_name', 'property_1', 'property_2', 'property_3', 'duration', 'extra_property')
+FEED_KINDS = (('chemical', ChemicalRecipe), ('mechanical', MechanicalCompound))
+
+def _feed_part(model, kind: str, filters: dict, position):
+    qs = model.objects.filter(**filters)
+    if position is not None:
+        created_at, pk, last_kind = position
+        after = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        # при равных (created_at, id) в разных таблицах порядок задает kind
+        if kind > last_kind:
+            after |= Q(created_at=created_at, id=pk)
+        qs = qs.filter(after)
+    # авторы и владелец приходят join'ами в той же строке, без ленивых догрузок
+    return qs.annotate(
+        kind=Value(kind, output_field=CharField()),
+        owner_name=F('owner__full_name'),
+        author_patient_name=F('author_patient__full_name'),
+        author_doctor_name=F('author_doctor__full_name'),
+    ).values_list(*FEED_FIELDS)
+
+def feed(*, owner: Optional[Patient] = None, author_patient: Optional[Patient] = None, author_doctor: Optional[Doctor] = None, cursor: Optional[str] = None, size: int = pagination.PAGE_SIZE) -> pagination.KeysetPage:
+    # Общая лента химических рецептов и механических соединений: один UNION ALL
+    # с сортировкой и LIMIT на стороне БД, постранично по (created_at, id, kind)
+    filters = {}
+    if owner is not None:
+        filters['owner'] = owner
+    if author_patient is not None:
+        filters['author_patient'] = author_patient
+    if author_doctor is not None:
+        filters['author_doctor'] = author_doctor
+    position = pagination.decode_cursor(cursor) if cursor else None
+    parts = [_feed_part(model, kind, filters, position) for kind, model in FEED_KINDS]
+    rows = list(parts[0].union(*parts[1:], all=True).order_by('-created_at', '-id', 'kind')[:size + 1])
+    items = []
+    for row in rows[:size]:
+        item = dict(zip(FEED_FIELDS, row))
+        if item['author_patient_name'] is not None:
+            item['author'] = f"Пациент: {item['author_patient_name']}"
+        elif item['author_doctor_name'] is not None:
+            item['author'] = f"Врач: {item['author_doctor_name']}"
+        else:
+            item['author'] = 'Автор не указан'
+        items.append(item)
+    next_cursor = None
+    if len(rows) > size:
+        last = items[-1]
+        next_cursor = pagination.encode_cursor(last['created_at'], last['id'], last['kind'])
+    return pagination.KeysetPage(items, next_cursor)
@@ -1,9 +1,64 @@
+from typing import List, Optional
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
 from ..models import Patient
+from . import cache as cache_svc
 from .mental_state import get_or_create as get_or_create_ms
 
+SKILL_FIELDS = ('chemistry_level', 'mechanics_level', 'social_skills_level', 'physical_skills_level')
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TTL = 60
+# Подстрочный поиск по триграммам имеет смысл с трех символов, короче — только префикс
+TRIGRAM_MIN_LENGTH = 3
+AUTOCOMPLETE_VERSION_KEY = 'patients:autocomplete:version'
+
 def list_patients():
     return Patient.objects.all().order_by('full_name')
 
+def search_patients(*, query: str = '', skills: Optional[dict] = None, mental_level: Optional[int] = None) -> QuerySet:
+    # Фильтры для списка пациентов врача; сортировку и страницы задает pagination.paginate_by
+    qs = Patient.objects.select_related('mental_state')
+    query = (query or '').strip().lstrip('@')
+    if query:
+        qs = qs.filter(Q(full_name__istartswith=query) | Q(nickname__istartswith=query) | Q(telegram__istartswith=query))
+    for field, value in (skills or {}).items():
+        if field in SKILL_FIELDS and value is not None:
+            qs = qs.filter(**{field: value})
+    if mental_level is not None:
+        qs = qs.filter(mental_state__level=mental_level)
+    return qs
+
+def filter_patients_by_name(qs: QuerySet, query: str) -> QuerySet:
+    # Поиск по имени/никнейму: icontains идет по GIN-индексам gin_trgm_ops, короткие запросы — по префиксным
+    query = (query or '').strip().lstrip('@')
+    if not query:
+        return qs
+    if len(query) < TRIGRAM_MIN_LENGTH:
+        return qs.filter(Q(full_name__istartswith=query) | Q(nickname__istartswith=query))
+    return qs.filter(Q(full_name__icontains=query) | Q(nickname__icontains=query))
+
+def autocomplete_patients(query: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[dict]:
+    query = (query or '').strip().lstrip('@')[:64]
+    if not query:
+        return []
+    # версия в ключе сбрасывает все закэшированные префиксы при сохранении любого пациента
+    version = cache.get_or_set(AUTOCOMPLETE_VERSION_KEY, 1, None)
+    key = f'patients:autocomplete:{version}:{limit}:{query.lower()}'
+    def build():
+        prefix = Q(full_name__istartswith=query) | Q(nickname__istartswith=query)
+        qs = (filter_patients_by_name(Patient.objects.all(), query)
+              .annotate(rank=Case(When(prefix, then=Value(0)), default=Value(1), output_field=IntegerField()))
+              .order_by('rank', 'full_name', 'id')
+              .values('id', 'full_name', 'nickname')[:limit])
+        return [{'id': p['id'], 'text': f"{p['full_name']} (@{p['nickname']})"} for p in qs]
+    return cache_svc.get_or_compute(key, build, AUTOCOMPLETE_TTL)
+
+def invalidate_autocomplete() -> None:
+    try:
+        cache.incr(AUTOCOMPLETE_VERSION_KEY)
+    except ValueError:
+        cache.set(AUTOCOMPLETE_VERSION_KEY, 1, None)
+
 def update_patient(patient: Patient, *, full_name: str, nickname: str, telegram: str, chemistry_level: int, mechanics_level: int, social_skills_level: int, physical_skills_level: int, bonus_level: str) -> Patient:
     patient.full_name = full_name
     patient.nickname = nickname
@@ -22,5 +77,5 @@ def update_patient(patient: Patient, *, full_name: str, nickname: str, telegram:
 def update_ms_description_for_patient(patient: Patient, description: str):
     ms = get_or_create_ms(patient)
     ms.description = description or ''
-    ms.save(update_fields='description')
+    ms.save(update_fields=['description'])
     return ms
\ No newline at end of file
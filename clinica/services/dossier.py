@@ -0,0 +1,65 @@
+from typing import Optional
+from django.core.cache import cache
+from django.db import transaction
+from ..models import Patient
+from . import cache as cache_svc
+from . import compounds as compounds_svc
+from . import maps as maps_svc
+
+# Досье пациента: профиль, ментальное состояние, обе карты и последние составы.
+# Собирается двумя запросами и кэшируется; сбрасывается сигналами при изменении
+# любой исходной строки (см. signals.py) и явно там, где запись идет мимо save()
+DOSSIER_TTL = 300
+RECENT_COMPOUNDS = 10
+# Поколение сбрасывает все досье разом — для массовых изменений (справочник, переименование врача)
+GENERATION_KEY = 'patient:dossier:generation'
+PATIENT_FIELDS = ('id', 'full_name', 'nickname', 'telegram', 'chemistry_level', 'mechanics_level', 'social_skills_level', 'physical_skills_level', 'bonus_level')
+
+
+def _key(patient_id: int) -> str:
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    return f'patient:dossier:{generation}:{patient_id}'
+
+
+def _build(patient_id: int) -> Optional[dict]:
+    patient = (Patient.objects.select_related('mental_state', 'awareness_map', 'nightmare_map')
+               .filter(id=patient_id).first())
+    if patient is None:
+        return None
+    ms = patient.mental_state
+    amap = getattr(patient, 'awareness_map', None)
+    nmap = getattr(patient, 'nightmare_map', None)
+    page = compounds_svc.feed(owner=patient, size=RECENT_COMPOUNDS)
+    return {
+        'patient': {f: getattr(patient, f) for f in PATIENT_FIELDS},
+        'mental_state': {'level': ms.level, 'description': ms.description} if ms else None,
+        'awareness': maps_svc._build_payload(amap) if amap else None,
+        'nightmare': maps_svc._build_payload(nmap) if nmap else None,
+        'compounds': page.items,
+        'compounds_next_cursor': page.next_cursor,
+    }
+
+
+def get_dossier(patient_id: int) -> Optional[dict]:
+    return cache_svc.get_or_compute(_key(patient_id), lambda: _build(patient_id), DOSSIER_TTL)
+
+
+def _invalidate_now(patient_id: int) -> None:
+    cache_svc.invalidate(_key(patient_id))
+
+
+def invalidate(patient_id: Optional[int]) -> None:
+    # после коммита — иначе параллельный запрос успеет собрать досье из старых данных
+    if patient_id is not None:
+        transaction.on_commit(lambda: _invalidate_now(patient_id))
+
+
+def _bump_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def invalidate_all() -> None:
+    transaction.on_commit(_bump_generation)
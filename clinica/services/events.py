@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Все воркеры публикуют события в один канал Redis; каждый ASGI-процесс держит
+# одну подписку и раздает сообщения по очередям своих SSE-клиентов
+CHANNEL = 'clinica:events'
+HEARTBEAT_INTERVAL = 15
+QUEUE_SIZE = 100
+RECONNECT_DELAY = 5
+
+
+def enabled(request) -> bool:
+    # Поток SSE не заканчивается: под синхронным gunicorn он занял бы воркер целиком,
+    # поэтому ленту включаем только когда приложение запущено под ASGI (SERVER_MODE=asgi)
+    return isinstance(request, ASGIRequest)
+
+
+def _redis_url() -> str:
+    return getattr(settings, 'CLINICA_EVENTS_REDIS_URL', None) or settings.CACHES['default']['LOCATION']
+
+
+def _send(message: str) -> None:
+    try:
+        from django_redis import get_redis_connection
+        get_redis_connection('default').publish(CHANNEL, message)
+    except Exception:
+        # живая лента — не повод ронять запрос
+        logger.warning('Не удалось опубликовать событие %s', message, exc_info=True)
+
+
+def publish(kind: str, *, patient: int, **data) -> None:
+    # Публикуем только после коммита, чтобы подписчик не увидел то, что откатится
+    message = json.dumps({'kind': kind, 'patient': patient, **data}, ensure_ascii=False)
+    transaction.on_commit(lambda: _send(message))
+
+
+class _Broadcaster:
+    def __init__(self):
+        self._queues = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self._queues.add(queue)
+        loop = asyncio.get_running_loop()
+        # задача привязана к своему циклу событий; под WSGI цикл на каждый запрос новый
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+        if not self._queues and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        import redis.asyncio as aioredis
+        while True:
+            client = aioredis.from_url(_redis_url())
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    for queue in list(self._queues):
+                        try:
+                            queue.put_nowait(message['data'])
+                        except asyncio.QueueFull:
+                            # медленный клиент пропускает события, остальных не тормозит
+                            pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning('Подписка на %s потеряна, переподключаемся', CHANNEL, exc_info=True)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+broadcaster = _Broadcaster()
+
+
+async def stream(patient_id: Optional[int] = None) -> AsyncIterator[str]:
+    queue = broadcaster.subscribe()
+    try:
+        yield f'retry: {RECONNECT_DELAY * 1000}\n\n'
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                # комментарий держит соединение живым через nginx и прокси
+                yield ': ping\n\n'
+                continue
+            event = json.loads(data)
+            if patient_id is not None and event.get('patient') != patient_id:
+                continue
+            yield f"event: {event['kind']}\ndata: {data.decode()}\n\n"
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,9 @@
+import os
+
+
+# Инициализация дочернего процесса пула bulk_register. Процессы запускаются через spawn,
+# поэтому модуль не импортирует моделей: распаковка задачи идет раньше django.setup()
+def init_worker(settings_module: str) -> None:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING
-from django.core.cache import cache
+from . import cache as cache_svc
+from . import events as events_svc
 if TYPE_CHECKING: from ..models import Patient, AwarenessMap, NightmareMap
 FIELDS = ['property_1_condition', 'property_1_description', 'property_2_condition', 'property_2_description', 'property_3_condition', 'property_3_description', 'property_4_condition', 'property_4_description', 'extra_property_1_description', 'extra_property_2_description',]
 
@@ -40,24 +41,10 @@ def _nightmare_key(pid: int) -> str:
     return f'nightmare:payload:{pid}'
 
 def get_awareness_payload(patient: 'Patient') -> dict:
-    key = _awareness_key(patient.id)
-    data = cache.get(key)
-    if data is not None:
-        return data
-    amap = get_or_create_awareness(patient)
-    data = _build_payload(amap)
-    cache.set(key, data, CACHE_TTL)
-    return data
+    return cache_svc.get_or_compute(_awareness_key(patient.id), lambda: _build_payload(get_or_create_awareness(patient)), CACHE_TTL)
 
 def get_nightmare_payload(patient: 'Patient') -> dict:
-    key = _nightmare_key(patient.id)
-    data = cache.get(key)
-    if data is not None:
-        return data
-    nmap = get_or_create_nightmare(patient)
-    data = _build_payload(nmap)
-    cache.set(key, data, CACHE_TTL)
-    return data
+    return cache_svc.get_or_compute(_nightmare_key(patient.id), lambda: _build_payload(get_or_create_nightmare(patient)), CACHE_TTL)
 
 def update_awareness(amap: 'AwarenessMap', data: dict) -> 'AwarenessMap':
 
@@ -69,7 +56,8 @@ def update_awareness(amap: 'AwarenessMap', data: dict) -> 'AwarenessMap':
             changed_fields.append(f)
     if changed_fields:
         amap.save(update_fields=changed_fields)
-        cache.delete(_awareness_key(amap.patient_id))
+        cache_svc.invalidate(_awareness_key(amap.patient_id))
+        events_svc.publish('awareness', patient=amap.patient_id, fields=changed_fields)
     return amap
 
 def update_nightmare(nmap: 'NightmareMap', data: dict) -> 'NightmareMap':
@@ -81,6 +69,7 @@ def update_nightmare(nmap: 'NightmareMap', data: dict) -> 'NightmareMap':
             changed_fields.append(f)
     if changed_fields:
         nmap.save(update_fields=changed_fields)
-        cache.delete(_nightmare_key(nmap.patient_id))
+        cache_svc.invalidate(_nightmare_key(nmap.patient_id))
+        events_svc.publish('nightmare', patient=nmap.patient_id, fields=changed_fields)
     return nmap
 
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, List, Optional, Tuple
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+from ..models import MentalStateEvent, MentalStateMinuteRollup, MentalStateHourRollup
+
+# События пишутся сразу, в транзакции изменения уровня: буфер в памяти воркера терялся
+# при его убийстве (таймаут gunicorn, OOM). Пачку событий можно записать одним вызовом record_many
+BATCH_SIZE = 500
+# До какого окна график строится по минутным агрегатам, до какого — по часовым;
+# дальше часовые агрегаты сворачиваются по дням прямо в БД
+MINUTE_WINDOW = timedelta(hours=6)
+HOUR_WINDOW = timedelta(days=14)
+
+
+def record(patient_id: int, level: int, at: Optional[datetime] = None) -> None:
+    record_many([(patient_id, level, at or timezone.now())])
+
+
+def record_many(events: Iterable[Tuple[int, int, datetime]]) -> int:
+    events = list(events)
+    if not events:
+        return 0
+    with transaction.atomic():
+        MentalStateEvent.objects.bulk_create(
+            [MentalStateEvent(patient_id=pid, level=level, created_at=at) for pid, level, at in events],
+            batch_size=BATCH_SIZE)
+        _upsert_rollups(MentalStateMinuteRollup, events, lambda at: at.replace(second=0, microsecond=0))
+        _upsert_rollups(MentalStateHourRollup, events, lambda at: at.replace(minute=0, second=0, microsecond=0))
+    return len(events)
+
+
+def _upsert_rollups(model, events, truncate) -> None:
+    # Сначала сворачиваем пачку в памяти, затем одним INSERT ... ON CONFLICT
+    # досчитываем min/max/сумму к уже существующим интервалам
+    buckets = {}
+    for pid, level, at in events:
+        key = (pid, truncate(at))
+        cur = buckets.get(key)
+        if cur is None:
+            buckets[key] = [level, level, level, 1]
+        else:
+            cur[0] = min(cur[0], level)
+            cur[1] = max(cur[1], level)
+            cur[2] += level
+            cur[3] += 1
+    table = model._meta.db_table
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(buckets))
+    params = []
+    # строки в порядке (пациент, интервал): параллельные записи берут блокировки
+    # в одном порядке и не упираются в deadlock
+    for (pid, bucket), (mn, mx, total, count) in sorted(buckets.items()):
+        params.extend([pid, bucket, mn, mx, total, count])
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {table} (patient_id, bucket, min_level, max_level, level_sum, samples)
+            VALUES {values}
+            ON CONFLICT (patient_id, bucket) DO UPDATE SET
+                min_level = LEAST({table}.min_level, EXCLUDED.min_level),
+                max_level = GREATEST({table}.max_level, EXCLUDED.max_level),
+                level_sum = {table}.level_sum + EXCLUDED.level_sum,
+                samples = {table}.samples + EXCLUDED.samples
+        """, params)
+
+
+def get_series(patient_id: int, start: datetime, end: datetime) -> dict:
+    # Точки графика за окно [start, end) — только из агрегатов, сырые события не читаются
+    # агрегаты лежат по UTC-интервалам
+    start = start.astimezone(dt_timezone.utc)
+    window = end - start
+    if window <= MINUTE_WINDOW:
+        resolution = 'minute'
+        rows = (MentalStateMinuteRollup.objects
+                .filter(patient_id=patient_id, bucket__gte=start.replace(second=0, microsecond=0), bucket__lt=end)
+                .order_by('bucket').values_list('bucket', 'min_level', 'max_level', 'level_sum', 'samples'))
+    elif window <= HOUR_WINDOW:
+        resolution = 'hour'
+        rows = (MentalStateHourRollup.objects
+                .filter(patient_id=patient_id, bucket__gte=start.replace(minute=0, second=0, microsecond=0), bucket__lt=end)
+                .order_by('bucket').values_list('bucket', 'min_level', 'max_level', 'level_sum', 'samples'))
+    else:
+        resolution = 'day'
+        rows = (MentalStateHourRollup.objects
+                .filter(patient_id=patient_id, bucket__gte=start.replace(hour=0, minute=0, second=0, microsecond=0), bucket__lt=end)
+                .annotate(day=TruncDay('bucket')).values('day')
+                .annotate(mn=Min('min_level'), mx=Max('max_level'), total=Sum('level_sum'), count=Sum('samples'))
+                .order_by('day').values_list('day', 'mn', 'mx', 'total', 'count'))
+    points: List[dict] = [
+        {'bucket': bucket.isoformat(), 'min': mn, 'max': mx, 'avg': round(total / count, 2)}
+        for bucket, mn, mx, total, count in rows
+    ]
+    return {'resolution': resolution, 'points': points}
@@ -1,40 +1,57 @@
+from typing import Iterable, Optional
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Now
 from ..models import Patient, MentalState, MentalStatePreset
+from . import dossier as dossier_svc
+from . import events as events_svc
+from . import mental_history as history_svc
+from . import presets as presets_svc
+from . import versions as versions_svc
+
+PROPAGATE_BATCH_SIZE = 5000
 
 def get_or_create(patient: Patient) -> MentalState:
+    # описание из справочника уже разнесено по строкам propagate_presets
     if patient.mental_state:
-        ms = patient.mental_state
-        try:
-            preset = MentalStatePreset.objects.get(level=ms.level)
-            if ms.description != preset.description:
-                ms.description = preset.description
-                ms.save(update_fields=['description'])
-        except MentalStatePreset.DoesNotExist:
-            pass
-        return ms
-        # создаем новое состояние, сразу с описанием из справочника (если есть)
-        preset_desc = ''
-        try:
-            preset_desc = MentalStatePreset.objects.get(level=0).description
-        except MentalStatePreset.DoesNotExist:
-            pass
-        ms = MentalState.objects.create(level=0, description=preset_desc)
-        patient.mental_state = ms
-        patient.save(update_fields=['mental_state'])
-        return ms
+        return patient.mental_state
+    # создаем новое состояние, сразу с описанием из справочника (если есть)
+    ms = MentalState.objects.create(level=0, description=presets_svc.get_description(0) or '')
+    patient.mental_state = ms
+    patient.save(update_fields=['mental_state'])
+    return ms
 
 
 def change_level(ms: MentalState, delta: int) -> MentalState:
-    new_level = max(-3, min(3, ms.level + delta))
-    if new_level != ms.level:
-        ms.level = new_level
-        # тянем описание из справочника
-        try:
-            preset = MentalStatePreset.objects.get(level=new_level)
-            ms.description = preset.description
-            ms.save(update_fields=['level', 'description'])
-        except MentalStatePreset.DoesNotExist:
-            # если нет пресета — сохраняем только уровень
-            ms.save(update_fields=['level'])
+    # Один UPDATE ... RETURNING: новый уровень ограничивается -3..3 прямо в БД,
+    # описание берется из справочника тем же запросом (если пресета нет — остается прежним).
+    # Параллельные клики не теряют изменений, а упор в границу ничего не пишет.
+    state_table = MentalState._meta.db_table
+    preset_table = MentalStatePreset._meta.db_table
+    patient_table = Patient._meta.db_table
+    # событие истории пишется в той же транзакции, что и новый уровень
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {state_table} AS ms
+            SET level = GREATEST(-3, LEAST(3, ms.level + %(delta)s)),
+                description = COALESCE(
+                    (SELECT p.description FROM {preset_table} AS p
+                     WHERE p.level = GREATEST(-3, LEAST(3, ms.level + %(delta)s))),
+                    ms.description),
+                updated_at = NOW()
+            WHERE ms.id = %(id)s AND GREATEST(-3, LEAST(3, ms.level + %(delta)s)) <> ms.level
+            RETURNING ms.level, ms.description,
+                (SELECT pt.id FROM {patient_table} AS pt WHERE pt.mental_state_id = ms.id)
+        """, {'delta': delta, 'id': ms.pk})
+        row = cursor.fetchone()
+        if row is not None and row[2] is not None:
+            history_svc.record(row[2], row[0])
+    if row is not None:
+        ms.level, ms.description, patient_id = row
+        if patient_id is not None:
+            events_svc.publish('mental_state', patient=patient_id, level=ms.level)
+            dossier_svc.invalidate(patient_id)
+            versions_svc.bump(f'mental_state:{patient_id}')
     return ms
 
 
@@ -43,4 +60,25 @@ def update_description(ms: MentalState, description: str) -> MentalState:
     # но в текущей постановке пациент его не использует.
     ms.description = description or ''
     ms.save(update_fields=['description'])
-    return ms
\ No newline at end of file
+    return ms
+
+
+def propagate_presets(levels: Optional[Iterable[int]] = None, batch_size: int = PROPAGATE_BATCH_SIZE) -> int:
+    # Переносит описания из справочника во все MentalState с тем же уровнем.
+    # Каждая пачка — один UPDATE с подзапросом к справочнику по level; уже
+    # обновленные строки выпадают из выборки, так что следующая пачка берет новые.
+    # Возвращает число измененных строк.
+    preset_desc = Subquery(MentalStatePreset.objects.filter(level=OuterRef('level')).values('description')[:1])
+    stale = MentalState.objects.annotate(preset_desc=preset_desc).filter(preset_desc__isnull=False).exclude(description=F('preset_desc'))
+    if levels is not None:
+        stale = stale.filter(level__in=list(levels))
+    touched = 0
+    while True:
+        batch = stale.order_by('id').values('id')[:batch_size]
+        updated = MentalState.objects.filter(id__in=Subquery(batch)).update(description=preset_desc, updated_at=Now())
+        touched += updated
+        if updated < batch_size:
+            if touched:
+                dossier_svc.invalidate_all()
+                versions_svc.bump('mental_state')
+            return touched
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+from django.db.models import Q, QuerySet
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class KeysetPage:
+    items: List
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, pk: int, kind: str = '') -> str:
+    # kind — дискриминатор таблицы для ленты из нескольких моделей (см. compounds.feed)
+    raw = f'{created_at.isoformat()}|{pk}|{kind}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int, str]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk, kind = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk), kind
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        # битый курсор — просто отдаем первую страницу
+        return None
+
+
+def paginate(qs: QuerySet, cursor: Optional[str] = None, size: int = PAGE_SIZE) -> KeysetPage:
+    # Курсор — (created_at, id) последней строки страницы. Условие «строго после курсора»
+    # идет по индексу (..., created_at, id), поэтому глубина страницы не влияет на время
+    qs = qs.order_by('-created_at', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        created_at, pk, _ = position
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    items = list(qs[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return KeysetPage(items, next_cursor)
+
+
+def encode_values(*values) -> str:
+    raw = json.dumps(list(values), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_values(cursor: str) -> Optional[list]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+        return values if isinstance(values, list) else None
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def paginate_by(qs: QuerySet, field: str, cursor: Optional[str] = None, size: int = PAGE_SIZE) -> KeysetPage:
+    # То же по возрастанию (field, id) — для списков, отсортированных по имени
+    qs = qs.order_by(field, 'id')
+    position = decode_values(cursor) if cursor else None
+    if position is not None and len(position) == 2:
+        value, pk = position
+        qs = qs.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+    items = list(qs[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_values(getattr(items[-1], field), items[-1].id)
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,56 @@
+import threading
+import time
+from types import MappingProxyType
+from typing import Mapping, Optional
+from django.core.cache import cache
+from django.db import transaction
+
+# Справочник MentalStatePreset крошечный (уровни -3..3), поэтому держим его целиком
+# в памяти процесса. Версия в Redis говорит остальным воркерам, что пора перечитать.
+VERSION_KEY = 'mental:presets:version'
+VERSION_CHECK_INTERVAL = 5
+
+_registry: Optional[Mapping[int, str]] = None
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _load() -> Mapping[int, str]:
+    from ..models import MentalStatePreset # локальный импорт
+    return MappingProxyType(dict(MentalStatePreset.objects.values_list('level', 'description')))
+
+
+def all_presets() -> Mapping[int, str]:
+    global _registry, _version, _checked_at
+    now = time.monotonic()
+    if _registry is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _registry
+    with _lock:
+        if _registry is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+            return _registry
+        version = cache.get_or_set(VERSION_KEY, 1, None)
+        if _registry is None or version != _version:
+            _registry = _load()
+            _version = version
+        _checked_at = now
+    return _registry
+
+
+def get_description(level: int) -> Optional[str]:
+    return all_presets().get(level)
+
+
+def _bump_version() -> None:
+    global _registry
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+    with _lock:
+        _registry = None
+
+
+def invalidate() -> None:
+    # Только после коммита: иначе другой воркер успеет перечитать старые данные под новой версией
+    transaction.on_commit(_bump_version)
@@ -1,25 +1,39 @@
+from django.core.files.uploadedfile import UploadedFile
 from ..models import Patient, Doctor
+from . import avatars as avatars_svc
+
+def _save_with_avatar(contact, avatar) -> None:
+    # Новый файл — строим копии 40/128/512 (WebP и JPEG); копии прежнего аватара удаляем
+    # и при замене, и при очистке (ClearableFileInput отдает False)
+    uploaded = isinstance(avatar, UploadedFile)
+    cleared = avatar is False
+    old_name = type(contact).objects.filter(pk=contact.pk).values_list('avatar', flat=True).first() if (uploaded or cleared) and contact.pk else None
+    if uploaded:
+        contact.avatar = avatar
+    elif cleared:
+        contact.avatar = None
+    contact.save()
+    if uploaded:
+        avatars_svc.build(contact.avatar)
+    if old_name and old_name != contact.avatar.name:
+        avatars_svc.delete(contact.avatar.storage, old_name)
 
 def update_patient_profile(patient: Patient, *, full_name: str, nickname: str, telegram: str = '', avatar=None) -> Patient:
     patient.full_name = full_name
     patient.nickname = nickname
     patient.telegram = telegram or ''
-    if avatar is not None:
-        patient.avatar = avatar
-        patient.save()
-    if patient.user and patient.user.username != nickname:
-        patient.user.username = nickname
-        patient.user.save()
+    _save_with_avatar(patient, avatar)
+    if patient.ser and patient.ser.username != nickname:
+        patient.ser.username = nickname
+        patient.ser.save()
     return patient
 
 def update_doctor_profile(doctor: Doctor, *, full_name: str, nickname: str, telegram: str = '', avatar=None) -> Doctor:
     doctor.full_name = full_name
     doctor.nickname = nickname
     doctor.telegram = telegram or ''
-    if avatar is not None:
-        doctor.avatar = avatar
-        doctor.save() 
+    _save_with_avatar(doctor, avatar)
     if doctor.user and doctor.user.username != nickname:
         doctor.user.username = nickname
         doctor.user.save()
-        return doctor
\ No newline at end of file
+    return doctor
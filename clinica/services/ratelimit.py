@@ -0,0 +1,105 @@
+import logging
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Bucket:
+    name: str
+    rate: float  # токенов в секунду
+    capacity: int  # допустимый всплеск
+
+
+# Попытки входа: по никнейму — против перебора пароля одного персонажа,
+# по IP — против клиента, который в цикле долбит разные никнеймы
+LOGIN_BY_NICKNAME = Bucket('login:nickname', rate=5 / 60, capacity=5)
+LOGIN_BY_IP = Bucket('login:ip', rate=30 / 60, capacity=30)
+KEY_PREFIX = 'ratelimit'
+
+# Атомарно для всех переданных корзин: досчитываем накопившиеся токены по часам Redis,
+# списываем по одному, только если хватает во всех, иначе возвращаем время ожидания.
+# Заодно ведем счетчики пропущенных и отклоненных попыток.
+_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local n = #KEYS - 2
+local tokens = {}
+local wait = 0
+for i = 1, n do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local data = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local value = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    value = math.min(capacity, value + math.max(0, now - ts) * rate)
+    tokens[i] = value
+    if value < 1 then
+        wait = math.max(wait, (1 - value) / rate)
+    end
+end
+for i = 1, n do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local value = tokens[i]
+    if wait == 0 then
+        value = value - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(value), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+if wait == 0 then
+    redis.call('INCR', KEYS[n + 1])
+else
+    redis.call('INCR', KEYS[n + 2])
+end
+return tostring(wait)
+"""
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _stats_key(group: str, outcome: str) -> str:
+    return f'{KEY_PREFIX}:stats:{group}:{outcome}'
+
+
+def take(group: str, buckets: Sequence[Tuple[Bucket, str]]) -> float:
+    # Возвращает 0, если попытка разрешена, иначе — через сколько секунд можно повторить
+    keys = [f'{KEY_PREFIX}:{bucket.name}:{identity}' for bucket, identity in buckets]
+    keys += [_stats_key(group, 'allowed'), _stats_key(group, 'rejected')]
+    args = []
+    for bucket, _ in buckets:
+        args += [bucket.rate, bucket.capacity]
+    try:
+        return float(_redis().eval(_SCRIPT, len(keys), *keys, *args))
+    except Exception:
+        # Redis недоступен — лучше пропустить вход, чем закрыть его всем
+        logger.warning('Ограничитель попыток недоступен, пропускаем', exc_info=True)
+        return 0.0
+
+
+def check_login(nickname: str, ip: Optional[str]) -> int:
+    buckets = [(LOGIN_BY_NICKNAME, (nickname or '').strip().lower())]
+    if ip:
+        buckets.append((LOGIN_BY_IP, ip))
+    wait = take('login', buckets)
+    return math.ceil(wait) if wait > 0 else 0
+
+
+def client_ip(request) -> Optional[str]:
+    # nginx перезаписывает X-Real-IP адресом клиента (см. deploy/bootstrap_vm.sh)
+    return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR')
+
+
+def counters(group: str = 'login') -> Dict[str, int]:
+    try:
+        allowed, rejected = _redis().mget(_stats_key(group, 'allowed'), _stats_key(group, 'rejected'))
+    except Exception:
+        logger.warning('Не удалось прочитать счетчики ограничителя', exc_info=True)
+        return {}
+    return {'allowed': int(allowed or 0), 'rejected': int(rejected or 0)}
@@ -0,0 +1,62 @@
+import hashlib
+import random
+from typing import Optional
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+
+# Счетчики версий ресурсов для условных GET: сигналы и сервисы увеличивают счетчик при записи,
+# а ETag считается из счетчиков одним MGET в Redis, без запросов в БД.
+# Пропавший (вытесненный или истекший) счетчик заводится заново со случайного значения,
+# чтобы не совпасть с ETag, выданным до вытеснения. Счетчики живут VERSION_TTL: запрос
+# к несуществующему id не оставляет в Redis вечный ключ, а истечение стоит одного полного ответа
+KEY_PREFIX = 'version'
+VERSION_TTL = 24 * 60 * 60
+
+
+def _key(scope: str) -> str:
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def get_many(*scopes: str) -> list:
+    keys = [_key(s) for s in scopes]
+    found = cache.get_many(keys)
+    missing = [k for k in keys if k not in found]
+    if missing:
+        for k in missing:
+            cache.add(k, random.randint(1, 2 ** 31), VERSION_TTL)
+        found.update(cache.get_many(missing))
+    return [found.get(k) for k in keys]
+
+
+def _bump_now(scopes) -> None:
+    for scope in scopes:
+        # INCR срок ключа не меняет
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(_key(scope), random.randint(1, 2 ** 31), VERSION_TTL)
+
+
+def bump(*scopes: str) -> None:
+    # после коммита — иначе клиент успеет закэшировать старые данные под новым ETag
+    scopes = [s for s in scopes if s]
+    if scopes:
+        transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def etag(*scopes: str, extra: tuple = ()) -> str:
+    versions = get_many(*scopes)
+    raw = repr((scopes, versions, extra)).encode()
+    return f'"{hashlib.md5(raw, usedforsecurity=False).hexdigest()}"'
+
+
+def not_modified(request, tag: Optional[str]) -> bool:
+    if tag is None or request.method not in ('GET', 'HEAD'):
+        return False
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    # сравнение слабое, как в django.utils.cache: W/"x" совпадает с "x"
+    return '*' in tags or tag.removeprefix('W/') in [t.removeprefix('W/') for t in tags]
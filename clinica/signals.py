@@ -1,15 +1,126 @@
-from django.core.cache import cache
-from django.db.models.signals import post_save
+import logging
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import AwarenessMap, NightmareMap
+from .auth_backends import user_cache_key
+from .models import AwarenessMap, NightmareMap, MentalStatePreset, ChemicalRecipe, MechanicalCompound, Patient, Doctor, MentalState
+from .services import cache as cache_svc
+from .services import doctors as doctors_svc
+from .services import dossier as dossier_svc
+from .services import events as events_svc
 from .services import maps as maps_svc
+from .services import mental_state as ms_svc
+from .services import presets as presets_svc
+from .services import versions as versions_svc
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=AwarenessMap)
 def clear_awareness_cache(sender, instance, **kwargs):
-    cache.delete(maps_svc._awareness_key(instance.patient_id))
+    cache_svc.invalidate(maps_svc._awareness_key(instance.patient_id))
 
 @receiver(post_save, sender=NightmareMap)
 def clear_nightmare_cache(sender, instance, **kwargs):
-    cache.delete(maps_svc._nightmare_key(instance.patient_id))
+    cache_svc.invalidate(maps_svc._nightmare_key(instance.patient_id))
+
+@receiver(post_save, sender=MentalStatePreset)
+@receiver(post_delete, sender=MentalStatePreset)
+def reload_presets(sender, instance, **kwargs):
+    presets_svc.invalidate()
+
+@receiver(post_save, sender=MentalStatePreset)
+def propagate_preset(sender, instance, **kwargs):
+    def run():
+        touched = ms_svc.propagate_presets(levels=[instance.level])
+        logger.info('Шаблон уровня %s разнесен по %s ментальным состояниям', instance.level, touched)
+    transaction.on_commit(run)
+
+@receiver(post_save, sender=ChemicalRecipe)
+@receiver(post_save, sender=MechanicalCompound)
+def announce_compound(sender, instance, created, **kwargs):
+    if created:
+        kind = 'chemical' if sender is ChemicalRecipe else 'mechanical'
+        events_svc.publish('compound', patient=instance.owner_id, type=kind, id=instance.id, property_1=instance.property_1)
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def reset_patient_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(doctors_svc.invalidate_autocomplete)
+
+# Досье пациента зависит от всех этих строк
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def reset_dossier_for_patient(sender, instance, **kwargs):
+    dossier_svc.invalidate(instance.id)
+
+@receiver(post_save, sender=AwarenessMap)
+@receiver(post_delete, sender=AwarenessMap)
+@receiver(post_save, sender=NightmareMap)
+@receiver(post_delete, sender=NightmareMap)
+def reset_dossier_for_map(sender, instance, **kwargs):
+    dossier_svc.invalidate(instance.patient_id)
+
+@receiver(post_save, sender=ChemicalRecipe)
+@receiver(post_delete, sender=ChemicalRecipe)
+@receiver(post_save, sender=MechanicalCompound)
+@receiver(post_delete, sender=MechanicalCompound)
+def reset_dossier_for_compound(sender, instance, **kwargs):
+    dossier_svc.invalidate(instance.owner_id)
+
+@receiver(post_save, sender=MentalState)
+@receiver(post_delete, sender=MentalState)
+def reset_dossier_for_mental_state(sender, instance, **kwargs):
+    for patient_id in Patient.objects.filter(mental_state_id=instance.id).values_list('id', flat=True):
+        dossier_svc.invalidate(patient_id)
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def reset_dossiers_for_doctor(sender, instance, created=False, **kwargs):
+    # имя врача-автора есть в составах многих пациентов; при удалении author_doctor
+    # обнуляется через UPDATE, мимо сигналов составов
+    if not created:
+        dossier_svc.invalidate_all()
+
+# Пользователь сессии кэшируется вместе с профилем (auth_backends.CachedModelBackend)
+def _reset_user(user_id):
+    if user_id is not None:
+        transaction.on_commit(lambda: cache_svc.invalidate(user_cache_key(user_id)))
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def reset_cached_user(sender, instance, **kwargs):
+    _reset_user(instance.pk)
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def reset_cached_user_for_patient(sender, instance, **kwargs):
+    _reset_user(instance.ser_id)
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def reset_cached_user_for_doctor(sender, instance, **kwargs):
+    _reset_user(instance.user_id)
+
+# Версии для ETag страниц пациента (services/versions.py)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def bump_patient_version(sender, instance, **kwargs):
+    versions_svc.bump(f'patient:{instance.id}')
+
+@receiver(post_save, sender=AwarenessMap)
+@receiver(post_delete, sender=AwarenessMap)
+def bump_awareness_version(sender, instance, **kwargs):
+    versions_svc.bump(f'awareness:{instance.patient_id}')
+
+@receiver(post_save, sender=NightmareMap)
+@receiver(post_delete, sender=NightmareMap)
+def bump_nightmare_version(sender, instance, **kwargs):
+    versions_svc.bump(f'nightmare:{instance.patient_id}')
 
+@receiver(post_save, sender=MentalState)
+@receiver(post_delete, sender=MentalState)
+def bump_mental_state_version(sender, instance, **kwargs):
+    patient_ids = Patient.objects.filter(mental_state_id=instance.id).values_list('id', flat=True)
+    versions_svc.bump(*[f'mental_state:{pid}' for pid in patient_ids])
@@ -0,0 +1,10 @@
+from django import template
+from ..services import avatars as avatars_svc
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar(field_file, size=128, style=''):
+    """ {% avatar patient.avatar 128 "height:100px;" %} — копия нужного размера в WebP/JPEG """
+    return avatars_svc.picture(field_file, int(size), style)
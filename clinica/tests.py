@@ -1,3 +1,532 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.contrib.messages import constants as message_constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import MessageEncoder
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .middleware import LoginRequiredMiddleware
+from .models import ChemicalRecipe, Doctor, MechanicalCompound, MentalState, MentalStateEvent, MentalStateHourRollup, MentalStateMinuteRollup, MentalStatePreset, Patient
+from .services import auth as auth_svc
+from .services import avatars as avatars_svc
+from .services import cache as cache_svc
+from .services import compounds as compounds_svc
+from .services import dossier as dossier_svc
+from .services import events as events_svc
+from .services import mental_history as history_svc
+from .services import mental_state as ms_svc
+from .services import profiles as profiles_svc
+from .services import ratelimit
+from .services import versions as versions_svc
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'UPDATE ... RETURNING с GREATEST/LEAST — только PostgreSQL')
+class MentalStateConcurrencyTests(TransactionTestCase):
+    THREADS = 12
+
+    def setUp(self):
+        for level in range(-3, 4):
+            MentalStatePreset.objects.create(level=level, description=f'Уровень {level}')
+        self.user = User.objects.create_user(username='racer', password='x')
+        self.ms = MentalState.objects.create(level=-3, description='')
+        Patient.objects.create(ser=self.user, full_name='Гонщик', nickname='racer', bonus_level='', mental_state=self.ms)
+
+    def _hammer(self, actions):
+        barrier = threading.Barrier(len(actions))
+        errors = []
+
+        def worker(action):
+            try:
+                client = Client()
+                client.force_login(self.user)
+                barrier.wait()
+                response = client.post(reverse('clinica:patient_mental_state'), {'action': action})
+                if response.status_code != 302:
+                    errors.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(a,)) for a in actions]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.ms.refresh_from_db()
+
+    def test_parallel_increments_are_not_lost(self):
+        self._hammer(['inc'] * 6)
+        self.assertEqual(self.ms.level, 3)
+        self.assertEqual(self.ms.description, 'Уровень 3')
+
+    def test_parallel_changes_are_clamped(self):
+        self._hammer(['inc'] * self.THREADS)
+        self.assertEqual(self.ms.level, 3)
+        self._hammer(['dec'] * self.THREADS)
+        self.assertEqual(self.ms.level, -3)
+        self.assertEqual(self.ms.description, 'Уровень -3')
+
+    def test_mixed_changes_net_out(self):
+        MentalState.objects.filter(pk=self.ms.pk).update(level=0)
+        # три inc и три dec в любом порядке не упираются в границы и дают 0
+        self._hammer(['inc', 'dec'] * 3)
+        self.assertEqual(self.ms.level, 0)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'INSERT ... ON CONFLICT с GREATEST/LEAST — только PostgreSQL')
+class MentalHistoryTests(TestCase):
+    def setUp(self):
+        self.ms = MentalState.objects.create(level=0, description='')
+        self.patient = Patient.objects.create(full_name='История', nickname='history', bonus_level='', mental_state=self.ms)
+        self.start = datetime(2024, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+    def test_events_fold_into_existing_buckets(self):
+        at = self.start + timedelta(minutes=5)
+        history_svc.record_many([(self.patient.id, 1, at), (self.patient.id, -2, at + timedelta(seconds=10))])
+        history_svc.record(self.patient.id, 3, at + timedelta(seconds=20))
+        history_svc.record(self.patient.id, 0, at + timedelta(minutes=1))
+        self.assertEqual(MentalStateEvent.objects.filter(patient=self.patient).count(), 4)
+        minute = MentalStateMinuteRollup.objects.get(patient=self.patient, bucket=at)
+        self.assertEqual((minute.min_level, minute.max_level, minute.level_sum, minute.samples), (-2, 3, 2, 3))
+        hour = MentalStateHourRollup.objects.get(patient=self.patient, bucket=self.start)
+        self.assertEqual((hour.min_level, hour.max_level, hour.level_sum, hour.samples), (-2, 3, 2, 4))
+
+    def test_change_level_writes_history_in_its_transaction(self):
+        ms_svc.change_level(self.ms, 1)
+        self.assertEqual(list(MentalStateEvent.objects.filter(patient=self.patient).values_list('level', flat=True)), [1])
+        # упор в границу ничего не меняет и ничего не пишет
+        MentalState.objects.filter(pk=self.ms.pk).update(level=3)
+        self.ms.refresh_from_db()
+        ms_svc.change_level(self.ms, 1)
+        self.assertEqual(MentalStateEvent.objects.filter(patient=self.patient).count(), 1)
+
+    def test_series_resolution_follows_window(self):
+        history_svc.record_many([(self.patient.id, level, self.start + timedelta(minutes=i)) for i, level in enumerate([1, 2, 3])])
+        series = history_svc.get_series(self.patient.id, self.start, self.start + timedelta(hours=1))
+        self.assertEqual(series['resolution'], 'minute')
+        self.assertEqual([p['max'] for p in series['points']], [1, 2, 3])
+        series = history_svc.get_series(self.patient.id, self.start, self.start + timedelta(days=1))
+        self.assertEqual((series['resolution'], series['points'][0]['avg']), ('hour', 2))
+        self.assertEqual(history_svc.get_series(self.patient.id, self.start, self.start + timedelta(days=30))['resolution'], 'day')
+
+
+def _redis_available():
+    try:
+        return bool(ratelimit._redis().ping())
+    except Exception:
+        return False
+
+
+@unittest.skipUnless(_redis_available(), 'ограничитель попыток проверяется на живом Redis')
+class LoginRateLimitTests(SimpleTestCase):
+    THREADS = 20
+
+    def setUp(self):
+        # свой префикс ключей: корзины и счетчики теста не смешиваются с боевыми и прошлыми прогонами
+        self.prefix = f'test-ratelimit-{uuid.uuid4().hex}'
+        patcher = mock.patch.object(ratelimit, 'KEY_PREFIX', self.prefix)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._drop_keys)
+        self.nickname = f'racer-{uuid.uuid4().hex}'
+        self.ip = f'test-{uuid.uuid4().hex}'
+
+    def _drop_keys(self):
+        keys = list(ratelimit._redis().scan_iter(f'{self.prefix}:*'))
+        if keys:
+            ratelimit._redis().delete(*keys)
+
+    def test_burst_is_capped_under_concurrency(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(ratelimit.check_login(self.nickname, self.ip))
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        capacity = ratelimit.LOGIN_BY_NICKNAME.capacity
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(results.count(0), capacity)
+        self.assertEqual(len([r for r in results if r > 0]), self.THREADS - capacity)
+        self.assertEqual(ratelimit.counters(), {'allowed': capacity, 'rejected': self.THREADS - capacity})
+
+    def test_rejected_attempt_does_not_consume_other_buckets(self):
+        # у IP на один токен больше, чем у никнейма: если отказы по никнейму списывали бы
+        # токены IP, второму никнейму с того же адреса ничего бы не осталось
+        capacity = ratelimit.LOGIN_BY_NICKNAME.capacity
+        with mock.patch.object(ratelimit, 'LOGIN_BY_IP', ratelimit.Bucket('login:ip', rate=1 / 3600, capacity=capacity + 1)):
+            for _ in range(capacity):
+                self.assertEqual(ratelimit.check_login(self.nickname, self.ip), 0)
+            for _ in range(3):
+                self.assertGreater(ratelimit.check_login(self.nickname, self.ip), 0)
+            other = f'racer-{uuid.uuid4().hex}'
+            self.assertEqual(ratelimit.check_login(other, self.ip), 0)
+            # а теперь исчерпан и IP
+            self.assertGreater(ratelimit.check_login(other, self.ip), 0)
+        self.assertEqual(ratelimit.counters(), {'allowed': capacity + 1, 'rejected': 4})
+
+    def test_nickname_is_case_insensitive(self):
+        for _ in range(ratelimit.LOGIN_BY_NICKNAME.capacity):
+            self.assertEqual(ratelimit.check_login(self.nickname.upper(), None), 0)
+        self.assertGreater(ratelimit.check_login(self.nickname, None), 0)
+
+
+class DoctorEventsTests(TestCase):
+    def setUp(self):
+        # сброс закэшированного пользователя сессии (clinica.auth_backends) идет через on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='watcher', password='x')
+        Doctor.objects.create(user=self.user, full_name='Наблюдатель', nickname='watcher')
+        self.patient = Patient.objects.create(full_name='Пациент', nickname='watched', bonus_level='')
+
+    def test_wsgi_disables_stream(self):
+        # под синхронными воркерами поток не отдается, а страница не открывает EventSource
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(reverse('clinica:doctor_events')).status_code, 204)
+        page = client.get(reverse('clinica:doctor_patient_detail', args=[self.patient.id]))
+        self.assertNotContains(page, 'EventSource')
+
+    def test_requires_doctor(self):
+        client = Client()
+        with self.captureOnCommitCallbacks(execute=True):
+            nosy = User.objects.create_user(username='nosy', password='x')
+        client.force_login(nosy)
+        self.assertEqual(client.get(reverse('clinica:doctor_events')).status_code, 403)
+
+    @unittest.skipUnless(_redis_available(), 'SSE проверяется на живом Redis')
+    async def test_stream_delivers_published_events(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('clinica:doctor_events'), {'patient': self.patient.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+        try:
+            self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+            other = json.dumps({'kind': 'awareness', 'patient': self.patient.id + 1})
+            event = json.dumps({'kind': 'mental_state', 'patient': self.patient.id, 'level': 2})
+            received = asyncio.ensure_future(anext(chunks))
+            # подписка поднимается в фоне — публикуем, пока событие не дойдет
+            for _ in range(50):
+                await asyncio.to_thread(events_svc._send, other)
+                await asyncio.to_thread(events_svc._send, event)
+                done, _ = await asyncio.wait({received}, timeout=0.1)
+                if done:
+                    break
+            chunk = await asyncio.wait_for(received, 1)
+            self.assertEqual(chunk, f'event: mental_state\ndata: {event}\n\n'.encode())
+        finally:
+            await chunks.aclose()
+
+
+def _image(name, color=(200, 30, 30, 255), size=(900, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class LoginRequiredMiddlewareTests(TestCase):
+    def test_async_chain_gets_coroutine_process_view(self):
+        async def get_response(request):
+            return None
+        self.assertTrue(asyncio.iscoroutinefunction(LoginRequiredMiddleware(get_response).process_view))
+        self.assertFalse(asyncio.iscoroutinefunction(LoginRequiredMiddleware(lambda request: None).process_view))
+
+    async def test_async_redirects_anonymous_and_passes_public_views(self):
+        client = AsyncClient()
+        response = await client.get(reverse('clinica:dashboard'))
+        self.assertEqual((response.status_code, response['Location']), (302, reverse('clinica:login')))
+        self.assertEqual((await client.get(reverse('clinica:login'))).status_code, 200)
+
+
+class AvatarRenditionsTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _patient(self, nickname, upload=None):
+        patient = Patient.objects.create(full_name=nickname, nickname=nickname, bonus_level='')
+        if upload is not None:
+            patient.avatar.save(upload.name, upload)
+        return patient
+
+    def test_build_creates_every_size_and_format(self):
+        patient = self._patient('avatar-a', _image('photo.png'))
+        self.assertTrue(avatars_svc.build(patient.avatar))
+        urls = avatars_svc.urls(patient.avatar)
+        self.assertEqual(set(urls), {(size, ext) for size in avatars_svc.SIZES for ext in avatars_svc.FORMATS})
+        for size in avatars_svc.SIZES:
+            with patient.avatar.storage.open(avatars_svc.rendition_name(patient.avatar.name, size, 'webp')) as f:
+                self.assertEqual(Image.open(f).size, (size, size))
+        self.assertIn(urls[(40, 'webp')], avatars_svc.picture(patient.avatar, 40))
+
+    def test_same_stem_with_other_extension_does_not_collide(self):
+        first = self._patient('avatar-b', _image('photo.png'))
+        second = self._patient('avatar-c', _image('photo.jpg'))
+        avatars_svc.build(first.avatar)
+        avatars_svc.build(second.avatar)
+        self.assertTrue(set(avatars_svc.urls(first.avatar).values()).isdisjoint(avatars_svc.urls(second.avatar).values()))
+        avatars_svc.delete(second.avatar.storage, second.avatar.name)
+        self.assertEqual(avatars_svc.urls(second.avatar), {})
+        self.assertEqual(len(avatars_svc.urls(first.avatar)), len(avatars_svc.SIZES) * len(avatars_svc.FORMATS))
+
+    def test_missing_renditions_fall_back_to_original(self):
+        patient = self._patient('avatar-d', _image('legacy.png'))
+        self.assertEqual(avatars_svc.urls(patient.avatar), {})
+        self.assertIn(patient.avatar.url, avatars_svc.picture(patient.avatar, 128))
+        broken = self._patient('avatar-e', SimpleUploadedFile('bad.png', b'not an image'))
+        with self.assertLogs(avatars_svc.logger, 'WARNING'):
+            self.assertFalse(avatars_svc.build(broken.avatar))
+
+    def test_profile_update_replaces_renditions(self):
+        patient = self._patient('avatar-f')
+        profiles_svc.update_patient_profile(patient, full_name='Ф', nickname='avatar-f', avatar=_image('one.png'))
+        old = patient.avatar.name
+        self.assertTrue(avatars_svc.urls(patient.avatar))
+        profiles_svc.update_patient_profile(patient, full_name='Ф', nickname='avatar-f', avatar=_image('two.png'))
+        self.assertTrue(avatars_svc.urls(patient.avatar))
+        self.assertFalse(patient.avatar.storage.exists(avatars_svc.rendition_name(old, 40, 'webp')))
+
+    def test_clearing_avatar_removes_renditions(self):
+        patient = self._patient('avatar-j')
+        profiles_svc.update_patient_profile(patient, full_name='Ф', nickname='avatar-j', avatar=_image('gone.png'))
+        old = patient.avatar.name
+        renditions = [avatars_svc.rendition_name(old, size, ext) for size in avatars_svc.SIZES for ext in avatars_svc.FORMATS]
+        self.assertTrue(all(patient.avatar.storage.exists(name) for name in renditions))
+        # форма с отмеченным «очистить» уже обнулила поле и передает avatar=False
+        patient.avatar = None
+        profiles_svc.update_patient_profile(patient, full_name='Ф', nickname='avatar-j', avatar=False)
+        patient.refresh_from_db()
+        self.assertFalse(patient.avatar)
+        self.assertFalse(any(patient.avatar.storage.exists(name) for name in renditions))
+
+    def test_backfill_skips_empty_avatars(self):
+        self._patient('avatar-g')
+        Patient.objects.create(full_name='Без', nickname='avatar-h', bonus_level='', avatar='')
+        patient = self._patient('avatar-i', _image('old.png'))
+        out = io.StringIO()
+        call_command('build_avatar_renditions', stdout=out)
+        self.assertIn('Построено: 1, ошибок: 0', out.getvalue())
+        self.assertTrue(avatars_svc.urls(patient.avatar))
+
+
+class CompoundArchiveTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(full_name='Владелец', nickname='owner', bonus_level='')
+
+    def _compound(self, model, duration):
+        return model.objects.create(owner=self.patient, author_patient=self.patient, property_1='a', property_2='b',
+                                    property_3='c', duration=duration)
+
+    def test_sweeper_archives_only_expired(self):
+        expired = self._compound(ChemicalRecipe, timedelta(seconds=-1))
+        active = self._compound(ChemicalRecipe, timedelta(hours=1))
+        self.assertEqual(compounds_svc.archive_expired(ChemicalRecipe, batch_size=1), 1)
+        expired.refresh_from_db()
+        active.refresh_from_db()
+        self.assertTrue(expired.is_archived)
+        self.assertFalse(active.is_archived)
+        self.assertEqual(list(compounds_svc.list_active_chemical(self.patient)), [active])
+
+    def test_extending_archived_compound_restores_it(self):
+        for model, list_active in ((ChemicalRecipe, compounds_svc.list_active_chemical),
+                                   (MechanicalCompound, compounds_svc.list_active_mechanical)):
+            compound = self._compound(model, timedelta(seconds=-1))
+            compounds_svc.archive_expired(model)
+            compound.duration = timedelta(hours=2)
+            compound.save(update_fields=['duration'])
+            compound.refresh_from_db()
+            self.assertFalse(compound.is_archived)
+            self.assertTrue(compound.is_active)
+            self.assertEqual(list(list_active(self.patient)), [compound])
+
+    def test_shortening_does_not_unarchive(self):
+        compound = self._compound(MechanicalCompound, timedelta(seconds=-1))
+        compounds_svc.archive_expired(MechanicalCompound)
+        compound.refresh_from_db()
+        compound.duration = timedelta(seconds=-10)
+        compound.save()
+        compound.refresh_from_db()
+        self.assertTrue(compound.is_archived)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'UPDATE ... RETURNING с GREATEST/LEAST — только PostgreSQL')
+class MentalStateVersionTests(TestCase):
+    def setUp(self):
+        self.ms = MentalState.objects.create(level=0, description='')
+        self.patient = Patient.objects.create(full_name='Версия', nickname='versioned', bonus_level='', mental_state=self.ms)
+
+    def test_change_level_bumps_patient_version(self):
+        scope = f'mental_state:{self.patient.id}'
+        before, = versions_svc.get_many(scope)
+        with self.captureOnCommitCallbacks(execute=True):
+            ms_svc.change_level(self.ms, +1)
+        self.assertEqual(versions_svc.get_many(scope), [before + 1])
+
+    def test_propagate_presets_bumps_shared_version(self):
+        MentalStatePreset.objects.update_or_create(level=0, defaults={'description': 'Новое описание'})
+        before, = versions_svc.get_many('mental_state')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertGreaterEqual(ms_svc.propagate_presets(levels=[0]), 1)
+        self.assertEqual(versions_svc.get_many('mental_state'), [before + 1])
+
+
+class PatientPageEtagTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='etag', password='x')
+            Patient.objects.create(ser=self.user, full_name='Кэш', nickname='etag', bonus_level='',
+                                   mental_state=MentalState.objects.create(level=0, description=''))
+        self.client.force_login(self.user)
+        self.url = reverse('clinica:patient_mental_state')
+
+    def test_pending_session_messages_disable_not_modified(self):
+        # первый ответ выдает cookie CSRF, а она входит в ETag
+        self.client.get(self.url)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # сообщение лежит в сессии, а cookie messages нет (SessionStorage; у FallbackStorage — хвост
+        # после переполнения cookie)
+        session = self.client.session
+        session['_messages'] = MessageEncoder().encode([Message(message_constants.SUCCESS, 'Сохранено')])
+        session.save()
+        self.assertNotIn('messages', self.client.cookies)
+        with override_settings(MESSAGE_STORAGE='django.contrib.messages.storage.session.SessionStorage'):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PatientDossierTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='curator', password='x')
+        Doctor.objects.create(user=self.user, full_name='Куратор', nickname='curator')
+        self.patient = Patient.objects.create(full_name='Подопечный', nickname='ward', bonus_level='')
+        for i in range(dossier_svc.RECENT_COMPOUNDS * 2 + 2):
+            ChemicalRecipe.objects.create(owner=self.patient, author_patient=self.patient, property_1=str(i),
+                                          property_2='b', property_3='c', duration=timedelta(hours=1))
+
+    def test_compound_pages_have_one_size(self):
+        # первая страница берется из досье, следующие — из ленты; размер у них общий
+        url = reverse('clinica:doctor_patient_detail', args=[self.patient.id])
+        self.client.force_login(self.user)
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['items']), dossier_svc.RECENT_COMPOUNDS)
+        second = self.client.get(url, {'after': first.context['next_cursor']})
+        self.assertEqual(len(second.context['items']), dossier_svc.RECENT_COMPOUNDS)
+        last = self.client.get(url, {'after': second.context['next_cursor']})
+        self.assertEqual(len(last.context['items']), 2)
+        self.assertIsNone(last.context['next_cursor'])
+
+    def test_deleting_doctor_resets_dossiers(self):
+        doctor = Doctor.objects.create(full_name='Уволенный', nickname='gone')
+        key = dossier_svc._key(self.patient.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.delete()
+        self.assertNotEqual(dossier_svc._key(self.patient.id), key)
+
+
+class BulkRegistrationTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            staff = User.objects.create_user(username='organizer', password='x', is_staff=True)
+        # сессия — для LoginRequiredMiddleware, force_authenticate — для JWT-аутентификации DRF
+        self.client = APIClient()
+        self.client.force_login(staff)
+        self.client.force_authenticate(staff)
+
+    def _upload(self, name, content):
+        return self.client.post('/api/clinica/bulk-register/', {'file': SimpleUploadedFile(name, content)})
+
+    def test_overlong_values_are_rejected_before_insert(self):
+        result = auth_svc.bulk_register([
+            {'nickname': 'n' * 65, 'password': 'x', 'full_name': 'Длинный', 'role': 'patient'},
+            {'nickname': 'short', 'password': 'x', 'full_name': 'Я' * 256, 'role': 'doctor'},
+            {'nickname': 'tg', 'password': 'x', 'full_name': 'Телеграм', 'role': 'patient', 'telegram': 't' * 65},
+        ])
+        self.assertEqual(result.created, 0)
+        self.assertEqual(len(result.errors), 3)
+        self.assertIn('nickname', result.errors[0])
+        self.assertIn('full_name', result.errors[1])
+        self.assertIn('telegram', result.errors[2])
+
+    def test_malformed_uploads_are_bad_requests(self):
+        self.assertEqual(self._upload('players.xlsx', b'not a zip').status_code, 400)
+        self.assertEqual(self._upload('players.csv', b'nickname,password\n\xff\xfe\xfa,x\n').status_code, 400)
+        too_many = 'nickname,password,full_name,role\n' + ''.join(
+            f'p{i},x,Игрок {i},patient\n' for i in range(auth_svc.BULK_API_MAX_ROWS + 1))
+        self.assertEqual(self._upload('players.csv', too_many.encode()).status_code, 400)
+        self.assertFalse(Patient.objects.filter(nickname='p0').exists())
+
+    def test_rows_with_wrong_field_count_are_bad_requests(self):
+        for body, line in ((b'nickname,password,full_name,role\na,b,c,patient,EXTRA\n', 2),
+                           (b'nickname,password,full_name,role\nok,x,Ok,patient\na,b\n', 3)):
+            with self.assertRaisesMessage(ValueError, f'Строка {line}:'):
+                auth_svc.read_registration_file(io.BytesIO(body), 'players.csv')
+            response = self._upload('players.csv', body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(f'Строка {line}', response.json()['detail'])
+        self.assertFalse(Patient.objects.filter(nickname__in=['a', 'ok']).exists())
+
+    def test_registers_valid_rows(self):
+        response = self._upload('players.csv', 'nickname,password,full_name,role,telegram\n'
+                                               'alpha,secret1,Альфа,patient,@alpha\n'
+                                               'beta,secret2,Бета,doctor,\n'.encode())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 2)
+        patient = Patient.objects.select_related('ser', 'mental_state').get(nickname='alpha')
+        self.assertTrue(patient.ser.check_password('secret1'))
+        self.assertIsNotNone(patient.mental_state)
+        self.assertTrue(Doctor.objects.filter(nickname='beta', user__username='beta').exists())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cache-format-tests'}})
+class ReadThroughCacheFormatTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        self.cache = cache
+        self.key = f'test:cache:{uuid.uuid4().hex}'
+        self.addCleanup(cache.delete, self.key)
+        # проверяем только уровень Redis: локальный LRU выключен, пока нет подписчика
+        for name, value in (('_ensure_listener', lambda: None), ('_listener_ready', threading.Event())):
+            patcher = mock.patch.object(cache_svc, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_legacy_plain_values_are_recomputed(self):
+        # до read-through кэша страницы карт лежали в Redis голыми значениями
+        for legacy in ({'rows': [1, 2]}, ('a', 'b'), ('a', 'b', 'c'), [1, 2, 3]):
+            self.cache.set(self.key, legacy)
+            self.assertEqual(cache_svc.get_or_compute(self.key, lambda: 'fresh', 60), 'fresh')
+            self.assertEqual(self.cache.get(self.key)[0], 'fresh')
+
+    def test_current_entries_are_served(self):
+        builds = []
+        cache_svc.get_or_compute(self.key, lambda: builds.append(1) or 'value', 60)
+        self.assertEqual(cache_svc.get_or_compute(self.key, lambda: builds.append(1) or 'other', 60), 'value')
+        self.assertEqual(len(builds), 1)
@@ -21,8 +21,12 @@ path('me/nightmare/', views.patient_nightmare, name='patient_nightmare'),
 
 # врач
 path('doctor/me/', views.doctor_profile, name='doctor_profile'),
+path('doctor/events/', views.doctor_events, name='doctor_events'),
+path('doctor/patients/autocomplete/', views.doctor_patient_autocomplete, name='doctor_patient_autocomplete'),
 path('doctor/patients/', views.doctor_patients, name='doctor_patients'),
 path('doctor/patients/<int:patient_id>/', views.doctor_patient_detail, name='doctor_patient_detail'),
+path('doctor/patients/<int:patient_id>/dossier/', views.doctor_patient_dossier, name='doctor_patient_dossier'),
+path('doctor/patients/<int:patient_id>/mental/history/', views.doctor_patient_mental_history, name='doctor_patient_mental_history'),
 path('doctor/patients/<int:patient_id>/awareness/', views.doctor_patient_awareness_edit, name='doctor_patient_awareness_edit'),
 path('doctor/patients/<int:patient_id>/nightmare/', views.doctor_patient_nightmare_edit, name='doctor_patient_nightmare_edit'),
 path('doctor/recipes/', views.doctor_chemical_recipes, name='doctor_chemical_recipes'),
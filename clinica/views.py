@@ -1,10 +1,18 @@
 
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from .forms import ( LoginForm, RegisterForm, PatientProfileForm, DoctorProfileForm, ChemicalRecipeForm, MechanicalCompoundForm, PatientEditByDoctorForm, MentalStateDescriptionForm )
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .forms import ( LoginForm, RegisterForm, PatientProfileForm, DoctorProfileForm, ChemicalRecipeForm, MechanicalCompoundForm, PatientEditByDoctorForm, MentalStateDescriptionForm, PatientFilterForm )
 from .models import Patient
 from .services import auth as auth_svc
 from .services import profiles as profiles_svc
@@ -12,6 +20,12 @@ from .services import mental_state as ms_svc
 from .services import compounds as compounds_svc
 from .services import maps as maps_svc
 from .services import doctors as doctors_svc
+from .services import dossier as dossier_svc
+from .services import mental_history as history_svc
+from .services import events as events_svc
+from .services import pagination
+from .services import ratelimit as ratelimit_svc
+from .services import versions as versions_svc
 
 
 def login_view(request):
@@ -23,6 +37,13 @@ def login_view(request):
         if form.is_valid():
             nickname = form.cleaned_data['nickname']
             password = form.cleaned_data['password']
+            # Отсекаем всплески до дорогого PBKDF2 в authenticate
+            retry_after = ratelimit_svc.check_login(nickname, ratelimit_svc.client_ip(request))
+            if retry_after:
+                form.add_error(None, f'Слишком много попыток входа. Повторите через {retry_after} с.')
+                response = render(request, 'clinica/auth/login.html', {'form': form, 'next': next_url}, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
             try:
                 user = auth_svc.authenticate_by_nickname(nickname, password)
             except Exception:
@@ -60,23 +81,6 @@ def register_view(request):
             return redirect('clinica:login')
     return render(request, 'clinica/auth/register.html', {'form': form})
 
-def _build_props_and_extras(obj):
-    # obj — AwarenessMap или NightmareMap
-    def val(name):
-        return getattr(obj, name, '') or ''
-    props = []
-    for i in range(1, 5):
-        props.append({
-            'num': i,
-            'condition': val(f'property_{i}_condition'),
-            'description': val(f'property_{i}_description'),
-        })
-    extras = {
-        'extra1': val('extra_property_1_description'),
-        'extra2': val('extra_property_2_description'),
-    }
-    return props, extras
-
 @login_required
 def dashboard(request):
     if hasattr(request.user, 'doctor_profile'):
@@ -97,7 +101,24 @@ def patient_profile(request):
         return redirect('clinica:patient_profile')
     return render(request, 'clinica/patient/profile.html', {'patient': patient, 'form': form})
 
+def _patient_page_etag(kind):
+    # ETag страницы пациента — из счетчиков версий в Redis, без запросов в БД (см. services/versions.py)
+    def etag_func(request, *args, **kwargs):
+        patient = getattr(request.user, 'patient_profile', None)
+        # флеш-сообщение показывается один раз, такую страницу рендерим заново. len() сообщения не
+        # расходует и видит любое хранилище, не только cookie: сообщения могут лежать в сессии
+        if patient is None or request.method != 'GET' or len(messages.get_messages(request)):
+            return None
+        scopes = [f'patient:{patient.id}', f'{kind}:{patient.id}']
+        if kind == 'mental_state':
+            scopes.append('mental_state')
+        return versions_svc.etag(*scopes, extra=(request.user.id, request.user.username, request.COOKIES.get(settings.CSRF_COOKIE_NAME)))
+    return etag_func
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_patient_page_etag('mental_state'))
 def patient_mental_state(request):
     if not hasattr(request.user, 'patient_profile'):
         return redirect('clinica:dashboard')
@@ -120,44 +141,46 @@ def patient_chemical_recipes(request):
     if not hasattr(request.user, 'patient_profile'):
         return redirect('clinica:dashboard')
     patient = request.user.patient_profile
-    items = compounds_svc.list_patient_chemical(patient)
+    page = pagination.paginate(compounds_svc.list_patient_chemical(patient), request.GET.get('after'))
     form = ChemicalRecipeForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         compounds_svc.create_patient_chemical( patient, property_1=form.cleaned_data['property_1'], property_2=form.cleaned_data['property_2'], property_3=form.cleaned_data['property_3'], duration=form.cleaned_data['duration'], extra_property=form.cleaned_data.get('extra_property') or '' )
         messages.success(request, 'Рецепт добавлен')
         return redirect('clinica:patient_chemical_recipes')
-    return render(request, 'clinica/patient/chemical_recipes.html', {'patient': patient, 'items': items, 'form': form})
+    return render(request, 'clinica/patient/chemical_recipes.html', {'patient': patient, 'items': page.items, 'next_cursor': page.next_cursor, 'form': form})
 
 @login_required
 def patient_mechanical_compounds(request):
     if not hasattr(request.user, 'patient_profile'):
         return redirect('clinica:dashboard')
     patient = request.user.patient_profile
-    items = compounds_svc.list_patient_mechanical(patient)
+    page = pagination.paginate(compounds_svc.list_patient_mechanical(patient), request.GET.get('after'))
     form = MechanicalCompoundForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
-        compounds_svc.create_patient_mechanical( patient, property_1=form.cleaned_data['property_1'], property_2=form.cleaned_data['property_2'], property_3=form.cleaned_datap['property_3'], duration=form.cleaned_data['duration'], extra_property=form.cleaned_data.get('extra_property') or '' )
+        compounds_svc.create_patient_mechanical( patient, property_1=form.cleaned_data['property_1'], property_2=form.cleaned_data['property_2'], property_3=form.cleaned_data['property_3'], duration=form.cleaned_data['duration'], extra_property=form.cleaned_data.get('extra_property') or '' )
         messages.success(request, 'Прибор добавлен')
         return redirect('clinica:patient_mechanical_compounds')
-    return render(request, 'clinica/patient/mechanical_compounds.html', {'patient': patient, 'items': items, 'form': form})
+    return render(request, 'clinica/patient/mechanical_compounds.html', {'patient': patient, 'items': page.items, 'next_cursor': page.next_cursor, 'form': form})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_patient_page_etag('awareness'))
 def patient_awareness(request):
     if not hasattr(request.user, 'patient_profile'):
         return redirect('clinica:dashboard')
     patient = request.user.patient_profile
-    amap = maps_svc.get_or_create_awareness(patient)
-    props, extras = _build_props_and_extras(amap)
-    return render(request, 'clinica/patient/awareness.html', { 'patient': patient, 'props': props, 'extras': extras, 'mode': 'awareness', })
+    payload = maps_svc.get_awareness_payload(patient)
+    return render(request, 'clinica/patient/awareness.html', { 'patient': patient, 'props': payload['props'], 'extras': payload['extras'], 'mode': 'awareness', })
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_patient_page_etag('nightmare'))
 def patient_nightmare(request):
     if not hasattr(request.user, 'patient_profile'):
         return redirect('clinica:dashboard')
     patient = request.user.patient_profile
-    nmap = maps_svc.get_or_create_nightmare(patient)
-    props, extras = _build_props_and_extras(nmap)
-    return render(request, 'clinica/patient/nightmare.html', { 'patient': patient, 'props': props, 'extras': extras, 'mode': 'nightmare', })
+    payload = maps_svc.get_nightmare_payload(patient)
+    return render(request, 'clinica/patient/nightmare.html', { 'patient': patient, 'props': payload['props'], 'extras': payload['extras'], 'mode': 'nightmare', })
 
 
 @login_required
@@ -176,14 +199,19 @@ def doctor_profile(request):
 def doctor_patients(request):
     if not hasattr(request.user, 'doctor_profile'):
         return redirect('clinica:dashboard')
-    patients = doctors_svc.list_patients()
-    return render(request, 'clinica/doctor/patients.html', {'patients': patients})
+    filter_form = PatientFilterForm(request.GET)
+    params = filter_form.cleaned_data if filter_form.is_valid() else {}
+    qs = doctors_svc.search_patients(query=params.get('q', ''), skills={f: params.get(f) for f in doctors_svc.SKILL_FIELDS}, mental_level=params.get('mental_level'))
+    page = pagination.paginate_by(qs, 'full_name', request.GET.get('after'))
+    nav_query = request.GET.copy()
+    nav_query.pop('after', None)
+    return render(request, 'clinica/doctor/patients.html', {'patients': page.items, 'next_cursor': page.next_cursor, 'filter_form': filter_form, 'nav_query': nav_query.urlencode(), 'live_events': events_svc.enabled(request)})
 
 @login_required
 def doctor_patient_detail(request, patient_id):
     if not hasattr(request.user, 'doctor_profile'):
         return redirect('clinica:dashboard')
-    patient = get_object_or_404(Patient, id=patient_id)
+    patient = get_object_or_404(Patient.objects.select_related('mental_state'), id=patient_id)
     form = PatientEditByDoctorForm(request.POST or None, instance=patient)
     ms_initial = {'description': patient.mental_state.description if patient.mental_state else ''}
     ms_form = MentalStateDescriptionForm(request.POST or None, initial=ms_initial)
@@ -198,7 +226,63 @@ def doctor_patient_detail(request, patient_id):
         if saved:
             messages.success(request, 'Изменения сохранены')
             return redirect('clinica:doctor_patient_detail', patient_id=patient.id)
-    return render(request, 'clinica/doctor/patient_detail.html', {'patient': patient, 'form': form, 'ms_form': ms_form})
+    if request.GET.get('after'):
+        # размер страницы тот же, что у первой страницы в досье
+        page = compounds_svc.feed(owner=patient, cursor=request.GET.get('after'), size=dossier_svc.RECENT_COMPOUNDS)
+        items, next_cursor = page.items, page.next_cursor
+    else:
+        # первая страница составов уже лежит в закэшированном досье
+        dossier = dossier_svc.get_dossier(patient.id)
+        items, next_cursor = dossier['compounds'], dossier['compounds_next_cursor']
+    return render(request, 'clinica/doctor/patient_detail.html', {'patient': patient, 'form': form, 'ms_form': ms_form, 'items': items, 'next_cursor': next_cursor, 'live_events': events_svc.enabled(request)})
+
+@login_required
+def doctor_patient_dossier(request, patient_id):
+    if not hasattr(request.user, 'doctor_profile'):
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    dossier = dossier_svc.get_dossier(patient_id)
+    if dossier is None:
+        return JsonResponse({'detail': 'Not found'}, status=404)
+    return JsonResponse(dossier)
+
+@login_required
+def doctor_patient_mental_history(request, patient_id):
+    # JSON для графика: ?from=...&to=... в ISO 8601, по умолчанию — последние сутки
+    if not hasattr(request.user, 'doctor_profile'):
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    patient = get_object_or_404(Patient, id=patient_id)
+    end = parse_datetime(request.GET.get('to') or '') or timezone.now()
+    start = parse_datetime(request.GET.get('from') or '') or end - timedelta(days=1)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    if start >= end:
+        return JsonResponse({'detail': 'Пустой интервал'}, status=400)
+    return JsonResponse({'patient': patient.id, **history_svc.get_series(patient.id, start, end)})
+
+@login_required
+def doctor_patient_autocomplete(request):
+    # JSON для выбора владельца: ?q=<часть имени или никнейма>
+    if not hasattr(request.user, 'doctor_profile'):
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    return JsonResponse({'results': doctors_svc.autocomplete_patients(request.GET.get('q', ''))})
+
+async def doctor_events(request):
+    # Server-Sent Events: изменения уровней, карт и новые составы. ?patient=<id> — только один пациент.
+    # Асинхронная вьюха: под ASGI соединение в ожидании не занимает поток
+    user = await request.auser()
+    if not user.is_authenticated or not await sync_to_async(hasattr)(user, 'doctor_profile'):
+        return HttpResponseForbidden()
+    if not events_svc.enabled(request):
+        # 204 — EventSource перестает переподключаться
+        return HttpResponse(status=204)
+    patient_id = request.GET.get('patient')
+    patient_id = int(patient_id) if patient_id and patient_id.isdigit() else None
+    response = StreamingHttpResponse(events_svc.stream(patient_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 def doctor_patient_awareness_edit(request, patient_id):
@@ -229,7 +313,7 @@ def doctor_chemical_recipes(request):
     if not hasattr(request.user, 'doctor_profile'):
         return redirect('clinica:dashboard')
     doctor = request.user.doctor_profile
-    items = compounds_svc.list_all_chemical()
+    page = pagination.paginate(compounds_svc.list_all_chemical(), request.GET.get('after'))
     form = ChemicalRecipeForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         owner_id = request.POST.get('owner_id')
@@ -237,15 +321,14 @@ def doctor_chemical_recipes(request):
         compounds_svc.create_doctor_chemical( doctor, owner, property_1=form.cleaned_data['property_1'], property_2=form.cleaned_data['property_2'], property_3=form.cleaned_data['property_3'], duration=form.cleaned_data['duration'], extra_property=form.cleaned_data.get('extra_property') or '' )
         messages.success(request, 'Рецепт добавлен')
         return redirect('clinica:doctor_chemical_recipes')
-    patients = doctors_svc.list_patients()
-    return render(request, 'clinica/doctor/chemical_recipes.html', {'doctor': doctor, 'items': items, 'form': form, 'patients': patients})
+    return render(request, 'clinica/doctor/chemical_recipes.html', {'doctor': doctor, 'items': page.items, 'next_cursor': page.next_cursor, 'form': form})
 
 @login_required
 def doctor_mechanical_compounds(request):
     if not hasattr(request.user, 'doctor_profile'):
         return redirect('clinica:dashboard')
     doctor = request.user.doctor_profile
-    items = compounds_svc.list_all_mechanical()
+    page = pagination.paginate(compounds_svc.list_all_mechanical(), request.GET.get('after'))
     form = MechanicalCompoundForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         owner_id = request.POST.get('owner_id')
@@ -253,5 +336,4 @@ def doctor_mechanical_compounds(request):
         compounds_svc.create_doctor_mechanical( doctor, owner, property_1=form.cleaned_data['property_1'], property_2=form.cleaned_data['property_2'], property_3=form.cleaned_data['property_3'], duration=form.cleaned_data['duration'], extra_property=form.cleaned_data.get('extra_property') or '' )
         messages.success(request, 'Прибор добавлен')
         return redirect('clinica:doctor_mechanical_compounds')
-    patients = doctors_svc.list_patients()
-    return render(request, 'clinica/doctor/mechanical_compounds.html', {'doctor': doctor, 'items': items, 'form': form, 'patients': patients})
+    return render(request, 'clinica/doctor/mechanical_compounds.html', {'doctor': doctor, 'items': page.items, 'next_cursor': page.next_cursor, 'form': form})
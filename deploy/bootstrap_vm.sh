@@ -8,6 +8,9 @@ PROJECT_DIR="/srv/mobius_strip"
 DJANGO_USER="django"
 PROJECT_PACKAGE="mobius_clinica"
 BIND_ADDR="127.0.0.1:8001"
+# wsgi — синхронные воркеры gunicorn; asgi — gunicorn с воркерами uvicorn (async-вьюхи /api/async/; живая лента SSE включается только в этом режиме)
+SERVER_MODE="${SERVER_MODE:-wsgi}"
+WORKERS="${WORKERS:-3}"
 
 # Переменные окружения Django
 SERVER_NAME="${SERVER_NAME:-vm-2fa9a6}"
@@ -235,6 +238,10 @@ configure_django() {
     # Сбор статических файлов (только если STATIC_ROOT настроен)
     log "Сбор статических файлов..."
     django_manage "python manage.py collectstatic --noinput --clear"
+
+    # Схема OpenAPI собирается один раз здесь, а не на каждый запрос к /api/schema/
+    log "Сборка схемы OpenAPI..."
+    django_manage "python manage.py build_openapi_schema"
     
     # Проверка валидности конфигурации Django (игнорируем предупреждения)
     log "Проверка конфигурации Django..."
@@ -282,11 +289,19 @@ configure_supervisor() {
     sudo mkdir -p "/var/log/${APP_NAME}"
     sudo chown -R "$DJANGO_USER:$DJANGO_USER" "/var/log/${APP_NAME}"
     
+    local server_command
+    case "$SERVER_MODE" in
+        wsgi) server_command="${PROJECT_DIR}/.venv/bin/gunicorn ${PROJECT_PACKAGE}.wsgi:application --bind ${BIND_ADDR} --workers ${WORKERS} --timeout 120" ;;
+        asgi) server_command="${PROJECT_DIR}/.venv/bin/gunicorn ${PROJECT_PACKAGE}.asgi:application --worker-class uvicorn.workers.UvicornWorker --bind ${BIND_ADDR} --workers ${WORKERS} --timeout 120" ;;
+        *) error "Неизвестный SERVER_MODE: ${SERVER_MODE} (ожидается wsgi или asgi)" ;;
+    esac
+    log "Режим сервера: ${SERVER_MODE}"
+
     # Создание конфигурационного файла
     sudo tee "$supervisor_conf" > /dev/null << EOF
 [program:${APP_NAME}]
 directory=${PROJECT_DIR}
-command=${PROJECT_DIR}/.venv/bin/gunicorn ${PROJECT_PACKAGE}.wsgi:application --bind ${BIND_ADDR} --workers 3 --timeout 120
+command=${server_command}
 user=${DJANGO_USER}
 autostart=true
 autorestart=true
@@ -297,7 +312,7 @@ stopasgroup=true
 killasgroup=true
 stdout_logfile=/var/log/${APP_NAME}/gunicorn.out.log
 stderr_logfile=/var/log/${APP_NAME}/gunicorn.err.log
-environment=DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE}",PYTHONUNBUFFERED="1",DEBUG="${DEBUG}",SECRET_KEY="${SECRET_KEY}",ALLOWED_HOSTS="${ALLOWED_HOSTS_ESCAPED}",CSRF_TRUSTED_ORIGINS="${CSRF_TRUSTED_ORIGINS_ESCAPED}",DB_NAME="${DB_NAME}",DB_USER="${DB_USER}",DB_PASSWORD="${DB_PASSWORD}",DB_HOST="${DB_HOST}",DB_PORT="${DB_PORT}",USE_REDIS="${USE_REDIS}",REDIS_URL="${REDIS_URL}",STATIC_ROOT="${STATIC_ROOT}",MEDIA_ROOT="${MEDIA_ROOT}"
+environment=DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE}",PYTHONUNBUFFERED="1",OPENAPI_PREBUILT="1",DEBUG="${DEBUG}",SECRET_KEY="${SECRET_KEY}",ALLOWED_HOSTS="${ALLOWED_HOSTS_ESCAPED}",CSRF_TRUSTED_ORIGINS="${CSRF_TRUSTED_ORIGINS_ESCAPED}",DB_NAME="${DB_NAME}",DB_USER="${DB_USER}",DB_PASSWORD="${DB_PASSWORD}",DB_HOST="${DB_HOST}",DB_PORT="${DB_PORT}",USE_REDIS="${USE_REDIS}",REDIS_URL="${REDIS_URL}",STATIC_ROOT="${STATIC_ROOT}",MEDIA_ROOT="${MEDIA_ROOT}"
 EOF
     
     # Применение конфигурации Supervisor
@@ -62,9 +62,15 @@ deploy_application() {
         
         echo 'Применение миграций базы данных...'
         python manage.py migrate || exit 1
+
+        echo 'Перенос отозванных JWT из token_blacklist в Redis...'
+        python manage.py flush_legacy_jwt_tokens || exit 1
         
         echo 'Сбор статических файлов...'
         python manage.py collectstatic --noinput --clear || exit 1
+
+        echo 'Сборка схемы OpenAPI...'
+        python manage.py build_openapi_schema || exit 1
         
         echo 'Django операции завершены успешно'
     " || error "Ошибка во время деплоя приложения"
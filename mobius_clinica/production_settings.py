@@ -3,6 +3,7 @@ Production settings for mobius_clinica
 """
 
 import os
+from pathlib import Path
 from .settings import *
 
 # Security settings
@@ -18,6 +19,18 @@ STATIC_URL = '/static/'
 MEDIA_ROOT = os.environ.get('MEDIA_ROOT', '/srv/mobius_strip/media')
 MEDIA_URL = '/media/'
 
+# OpenAPI: схема собрана при деплое (build_openapi_schema), процессы сервера запускаются с
+# OPENAPI_PREBUILT=1 и не импортируют drf_spectacular при старте — ни приложение, ни
+# DEFAULT_SCHEMA_CLASS (его DRF импортирует при построении URL роутера). Шаблоны Swagger/Redoc
+# берем из пакета напрямую; management-команды запускаются без флага и собирают схему как обычно
+OPENAPI_PREBUILT = os.environ.get('OPENAPI_PREBUILT', '0') == '1' and not DEBUG
+if OPENAPI_PREBUILT:
+    import importlib.util
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'drf_spectacular']
+    REST_FRAMEWORK = {key: value for key, value in REST_FRAMEWORK.items() if key != 'DEFAULT_SCHEMA_CLASS'}
+    TEMPLATES[0]['DIRS'] = [*TEMPLATES[0]['DIRS'],
+                            Path(importlib.util.find_spec('drf_spectacular').submodule_search_locations[0]) / 'templates']
+
 # Database
 DATABASES = {
     'default': {
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_redis',
     'clinica.apps.ClinicaConfig',
     'rest_framework',
@@ -51,9 +52,16 @@ REST_FRAMEWORK = { 'DEFAULT_AUTHENTICATION_CLASSES': ( 'rest_framework_simplejwt
                    'DEFAULT_PAGINATION_CLASS': 'tasks.pagination.QueryPageSizePagination',
                    'PAGE_SIZE': 10,
                    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'}
-SIMPLE_JWT = {'BLACKLIST_AFTER_ROTATION': True}
+SIMPLE_JWT = {
+    'BLACKLIST_AFTER_ROTATION': True,
+    # отзыв refresh-токенов хранится в Redis (tasks/blacklist.py), а не в таблицах token_blacklist
+    'TOKEN_OBTAIN_SERIALIZER': 'tasks.serializers.RedisTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'tasks.serializers.RedisTokenRefreshSerializer',
+}
 
 SPECTACULAR_SETTINGS = { 'TITLE': 'Tasks API', 'DESCRIPTION': 'API для управления задачами', 'VERSION': '1.0.0'}
+# Готовая схема OpenAPI (manage.py build_openapi_schema, см. tasks/openapi.py)
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -99,6 +107,14 @@ DATABASES = {
         "NAME": 'mobius_clinica'}}
 
 
+# Сессии читаются из Redis и дублируются в БД; пользователь с профилем роли — тоже из кэша.
+# ModelBackend оставлен, чтобы не разлогинить уже открытые сессии
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = [
+    'clinica.auth_backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 LOGIN_URL = 'clinica:login'
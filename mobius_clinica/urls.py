@@ -21,9 +21,11 @@ from django.urls import path, include
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from tasks.views import TaskViewSet, RegisterView, LogoutView
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from tasks import async_views as tasks_async
+from tasks.views import TaskViewSet, RegisterView, LogoutView, ThrottledTokenObtainPairView
+from clinica.api import BulkRegisterView, LoginRateLimitStatsView
+from rest_framework_simplejwt.views import TokenRefreshView
+from tasks import openapi
 
 
 router = DefaultRouter()
@@ -34,17 +36,24 @@ urlpatterns = [path('admin/', admin.site.urls),
 
                # API задач
                path('api/', include(router.urls)),
+               # они же асинхронно — для ASGI-воркеров (SERVER_MODE=asgi в deploy/bootstrap_vm.sh)
+               path('api/async/tasks/', tasks_async.task_list, name='async_task_list'),
+               path('api/async/tasks/<int:pk>/', tasks_async.task_detail, name='async_task_detail'),
 
                # Аутентификация
                path('api/auth/register/', RegisterView.as_view(), name='register'),
-               path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+               path('api/auth/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
                path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
                path('api/auth/logout/', LogoutView.as_view(), name='logout'),
 
+               # Массовая регистрация персонажей (staff)
+               path('api/clinica/bulk-register/', BulkRegisterView.as_view(), name='clinica_bulk_register'),
+               path('api/clinica/ratelimit/', LoginRateLimitStatsView.as_view(), name='clinica_ratelimit_stats'),
+
                # Документация
-               path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-               path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-               path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc')]
+               path('api/schema/', openapi.schema_view, name='schema'),
+               path('api/docs/', openapi.lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+               path('api/redoc/', openapi.lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc')]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
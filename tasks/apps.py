@@ -5,3 +5,5 @@ class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
 
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from clinica.services import pagination
+from .models import Task
+from .pagination import QueryPageSizePagination
+from .serializers import TASK_FIELDS, TaskSerializer, task_rows_data
+
+# Асинхронные вьюхи задач для ASGI (deploy/bootstrap_vm.sh, SERVER_MODE=asgi): ожидание БД
+# не держит поток воркера. Задача сериализуется так же, как в /api/tasks/, но список — без count и
+# previous: {'next': ссылка на следующую страницу или null, 'results': [...]}, курсор по (created_at, id):
+# GET /api/async/tasks/?after=<курсор>&page_size=N, POST /api/async/tasks/, GET /api/async/tasks/<id>/
+_jwt = JWTAuthentication()
+_renderer = JSONRenderer()
+# Под ASGI у каждого запроса свой поток для ORM и свое соединение с PostgreSQL: при 500 клиентах
+# это упирается в max_connections (100). На воркер одновременно не больше стольких запросов к БД
+# (3 воркера — 75 соединений), остальные ждут в цикле событий, не занимая потоков
+DB_CONNECTIONS = 25
+_db_slots = asyncio.Semaphore(DB_CONNECTIONS)
+
+
+def _close_connections():
+    # то же, что close_old_connections по request_finished, но до освобождения слота, а не после
+    # отправки ответа; соединение внутри открытой транзакции (TestCase) не трогаем
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+
+
+@asynccontextmanager
+async def _db_slot():
+    async with _db_slots:
+        try:
+            yield
+        finally:
+            await sync_to_async(_close_connections)()
+
+
+def _json(data, status_code=status.HTTP_200_OK) -> HttpResponse:
+    return HttpResponse(_renderer.render(data), status=status_code, content_type='application/json')
+
+
+async def _authenticate(request) -> Optional[object]:
+    # То же, что JWTAuthentication.authenticate, но пользователь читается через aget.
+    # Проверка подписи и срока токена — чистые вычисления, поток для них не нужен
+    header = _jwt.get_header(request)
+    if header is None:
+        return None
+    raw = _jwt.get_raw_token(header)
+    if raw is None:
+        return None
+    token = _jwt.get_validated_token(raw)
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+    try:
+        user = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if not api_settings.USER_AUTHENTICATION_RULE(user):
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def _page_size(request) -> int:
+    size = request.GET.get('page_size', '')
+    if size.isdigit() and int(size) > 0:
+        return min(int(size), QueryPageSizePagination.max_page_size)
+    return QueryPageSizePagination.page_size
+
+
+def jwt_view(view):
+    # Проверку JWT делает сама вьюха; LoginRequiredMiddleware такие вьюхи пропускает
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        async with _db_slot():
+            try:
+                request.jwt_user = await _authenticate(request)
+            except (InvalidToken, AuthenticationFailed) as e:
+                return _json(e.detail, status.HTTP_401_UNAUTHORIZED)
+            return await view(request, *args, **kwargs)
+    wrapper.jwt_authenticated = True
+    return wrapper
+
+
+async def _list(request):
+    qs = Task.objects.order_by('-created_at', '-id')
+    if request.GET.get('mine') in ('1', 'true'):
+        if request.jwt_user is None:
+            return _json({'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED)
+        qs = qs.filter(owner=request.jwt_user)
+    size = _page_size(request)
+    # условие то же, что в clinica.services.pagination.paginate; битый курсор — первая страница
+    position = pagination.decode_cursor(request.GET['after']) if request.GET.get('after') else None
+    if position is not None:
+        created_at, pk, _ = position
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = [row async for row in qs.values(*TASK_FIELDS)[:size + 1].aiterator()]
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'after',
+                                       pagination.encode_cursor(rows[-1]['created_at'], rows[-1]['id']))
+    return _json({'next': next_url, 'results': task_rows_data(rows)})
+
+
+async def _create(request):
+    if request.jwt_user is None:
+        return _json({'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return _json({'detail': 'JSON parse error'}, status.HTTP_400_BAD_REQUEST)
+    serializer = TaskSerializer(data=data)
+    # у TaskSerializer нет валидаторов, которые ходят в БД, — проверка не блокирует цикл
+    if not serializer.is_valid():
+        return _json(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    task = await Task.objects.acreate(owner=request.jwt_user, **serializer.validated_data)
+    return _json(TaskSerializer(task).data, status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@jwt_view
+async def task_list(request):
+    if request.method == 'POST':
+        return await _create(request)
+    return await _list(request)
+
+
+@require_http_methods(['GET'])
+@jwt_view
+async def task_detail(request, pk):
+    try:
+        row = await Task.objects.values(*TASK_FIELDS).aget(pk=pk)
+    except Task.DoesNotExist:
+        return _json({'detail': 'No Task matches the given query.'}, status.HTTP_404_NOT_FOUND)
+    return _json(task_rows_data([row])[0])
@@ -0,0 +1,103 @@
+from typing import List, Tuple
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from clinica.services import versions as versions_svc
+from .models import Task
+from .serializers import TaskSerializer
+from .signals import task_version_scopes
+
+# Пакетные изменения задач: [{"op": "create", "data": {...}}, {"op": "patch", "id": 1, "data": {...}},
+# {"op": "delete", "id": 2}]. Пакет применяется целиком в одной транзакции или не применяется вовсе;
+# ответ — результат по каждой операции в исходном порядке
+MAX_OPERATIONS = 500
+OPS = ('create', 'patch', 'delete')
+
+
+def _parse(operations) -> Tuple[list, list]:
+    # Структурная проверка: тип операции, id, data. Ошибки — по индексу операции
+    errors = [None] * len(operations)
+    seen = set()
+    for i, item in enumerate(operations):
+        if not isinstance(item, dict) or item.get('op') not in OPS:
+            errors[i] = {'op': [f'Ожидается одно из: {", ".join(OPS)}']}
+            continue
+        if item['op'] != 'delete' and not isinstance(item.get('data'), dict):
+            errors[i] = {'data': ['Ожидается объект']}
+            continue
+        if item['op'] != 'create':
+            pk = item.get('id')
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                errors[i] = {'id': ['Ожидается id задачи']}
+            elif pk in seen:
+                errors[i] = {'id': ['Задача уже изменяется в этом пакете']}
+            else:
+                seen.add(pk)
+    return errors, sorted(seen)
+
+
+def apply(operations: List[dict], user) -> Tuple[int, list]:
+    if not isinstance(operations, list) or not operations:
+        return status.HTTP_400_BAD_REQUEST, [{'non_field_errors': ['Ожидается непустой список операций']}]
+    if len(operations) > MAX_OPERATIONS:
+        return status.HTTP_400_BAD_REQUEST, [{'non_field_errors': [f'Не больше {MAX_OPERATIONS} операций за раз']}]
+    errors, ids = _parse(operations)
+
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update().in_bulk(ids)
+        creates = [i for i, item in enumerate(operations) if errors[i] is None and item['op'] == 'create']
+        patches = [i for i, item in enumerate(operations) if errors[i] is None and item['op'] == 'patch']
+        deletes = [i for i, item in enumerate(operations) if errors[i] is None and item['op'] == 'delete']
+        for i in patches + deletes:
+            if operations[i]['id'] not in tasks:
+                errors[i] = {'id': ['Задача не найдена']}
+        patches = [i for i in patches if errors[i] is None]
+
+        create_ser = TaskSerializer(data=[operations[i]['data'] for i in creates], many=True)
+        if not create_ser.is_valid():
+            for i, err in zip(creates, create_ser.errors):
+                errors[i] = err or None
+        patch_ser = TaskSerializer([tasks[operations[i]['id']] for i in patches],
+                                   data=[operations[i]['data'] for i in patches], many=True, partial=True)
+        if not patch_ser.is_valid():
+            for i, err in zip(patches, patch_ser.errors):
+                errors[i] = err or None
+
+        if any(errors):
+            return status.HTTP_400_BAD_REQUEST, [
+                # 424: операция корректна, но не применена из-за ошибок в соседних
+                {'status': status.HTTP_400_BAD_REQUEST, 'errors': err} if err else {'status': status.HTTP_424_FAILED_DEPENDENCY}
+                for err in errors]
+
+        results = [None] * len(operations)
+        now = timezone.now()
+        created = Task.objects.bulk_create(
+            [Task(owner=user, **attrs) for attrs in create_ser.validated_data])
+        for i, task in zip(creates, created):
+            results[i] = {'status': status.HTTP_201_CREATED, 'data': task}
+
+        changed_fields = {'updated_at'}
+        updated = []
+        for i, attrs in zip(patches, patch_ser.validated_data):
+            task = tasks[operations[i]['id']]
+            for field, value in attrs.items():
+                setattr(task, field, value)
+            # bulk_update не трогает auto_now
+            task.updated_at = now
+            changed_fields.update(attrs)
+            updated.append(task)
+            results[i] = {'status': status.HTTP_200_OK, 'data': task}
+        if updated:
+            Task.objects.bulk_update(updated, sorted(changed_fields))
+        # bulk_create/bulk_update не шлют post_save — версии для ETag поднимаем сами
+        versions_svc.bump(*{scope for task in created + updated for scope in task_version_scopes(task)})
+
+        if deletes:
+            Task.objects.filter(id__in=[operations[i]['id'] for i in deletes]).delete()
+        for i in deletes:
+            results[i] = {'status': status.HTTP_204_NO_CONTENT, 'id': operations[i]['id']}
+
+    for result in results:
+        if 'data' in result:
+            result['data'] = TaskSerializer(result['data']).data
+    return status.HTTP_200_OK, results
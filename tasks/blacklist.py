@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from typing import Iterable, Optional
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+logger = logging.getLogger(__name__)
+
+# Отозванные JTI живут в Redis в одном sorted set (score — exp токена), а не в растущих
+# таблицах token_blacklist. Перед Redis в каждом процессе стоит фильтр Блума: «нет в фильтре» —
+# значит точно не отозван, и проверка обходится без сети. Фильтр пересобирается из Redis
+# при подключении и раз в BLOOM_REBUILD секунд, новые отзывы прилетают через pub/sub
+BLACKLIST_KEY = 'jwt:blacklist'
+CHANNEL = 'jwt:blacklist:added'
+BLOOM_CAPACITY = 100_000
+BLOOM_ERROR_RATE = 0.01
+BLOOM_REBUILD = 300
+RECONNECT_DELAY = 5
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # двойное хэширование: k позиций из двух половин одного дайджеста
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _build_filter(jtis: Iterable[bytes]) -> _BloomFilter:
+    bloom = _BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+    for jti in jtis:
+        bloom.add(jti.decode())
+    return bloom
+
+
+_filter: Optional[_BloomFilter] = None
+# Пока фильтр не собран или подписка потеряна, каждая проверка идет прямо в Redis
+_ready = threading.Event()
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _rebuild(conn) -> None:
+    global _filter
+    conn.zremrangebyscore(BLACKLIST_KEY, '-inf', time.time())
+    _filter = _build_filter(conn.zrange(BLACKLIST_KEY, 0, -1))
+
+
+def _listen() -> None:
+    while True:
+        pubsub = None
+        try:
+            conn = _redis()
+            pubsub = conn.pubsub()
+            pubsub.subscribe(CHANNEL)
+            while pubsub.get_message(timeout=RECONNECT_DELAY) is None:
+                pass
+            # собираем фильтр уже после подписки — отзыв между чтением и подпиской не потеряется
+            _rebuild(conn)
+            _ready.set()
+            rebuild_at = time.time() + BLOOM_REBUILD
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message and message['type'] == 'message':
+                    _filter.add(message['data'].decode())
+                if time.time() >= rebuild_at:
+                    _rebuild(conn)
+                    rebuild_at = time.time() + BLOOM_REBUILD
+        except Exception:
+            logger.warning('Подписка на %s потеряна, отзыв токенов проверяется напрямую в Redis', CHANNEL, exc_info=True)
+        finally:
+            _ready.clear()
+            if pubsub is not None:
+                pubsub.close()
+        time.sleep(RECONNECT_DELAY)
+
+
+def _ensure_listener() -> None:
+    # как и в clinica.services.cache: поток заводится лениво в каждом процессе после fork
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        _ready.clear()
+        threading.Thread(target=_listen, name='jwt-blacklist', daemon=True).start()
+
+
+def add(jti: str, exp: int) -> None:
+    if exp <= time.time():
+        return
+    conn = _redis()
+    conn.zadd(BLACKLIST_KEY, {jti: exp})
+    conn.publish(CHANNEL, jti)
+    if _filter is not None:
+        _filter.add(jti)
+
+
+def add_many(tokens: Iterable[tuple]) -> int:
+    # (jti, exp) пачкой — для переноса из старых таблиц
+    now = time.time()
+    mapping = {jti: exp for jti, exp in tokens if exp > now}
+    if mapping:
+        _redis().zadd(BLACKLIST_KEY, mapping)
+    return len(mapping)
+
+
+def contains(jti: str) -> bool:
+    _ensure_listener()
+    bloom = _filter
+    if _ready.is_set() and bloom is not None and jti not in bloom:
+        return False
+    exp = _redis().zscore(BLACKLIST_KEY, jti)
+    return exp is not None and exp > time.time()
+
+
+class RedisRefreshToken(RefreshToken):
+    """ Refresh-токен, который хранит отзыв в Redis и не пишет в OutstandingToken/BlacklistedToken """
+
+    def check_blacklist(self) -> None:
+        try:
+            revoked = contains(self.payload[api_settings.JTI_CLAIM])
+        except Exception:
+            # без Redis не можем доказать, что токен не отозван
+            logger.warning('Хранилище отозванных токенов недоступно', exc_info=True)
+            raise TokenError(_('Token blacklist is unavailable'))
+        if revoked:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self) -> None:
+        add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+
+    @classmethod
+    def for_user(cls, user):
+        # минуем BlacklistMixin.for_user — строка в OutstandingToken больше не нужна
+        return Token.for_user.__func__(cls, user)
@@ -0,0 +1,71 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер N одновременными клиентами (keep-alive) и печатает rps и задержки. '
+            'Пример сравнения: gunicorn wsgi на /api/tasks/ против ASGI-воркеров на /api/async/tasks/ '
+            'при --clients 500')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='например http://127.0.0.1:8001/api/async/tasks/')
+        parser.add_argument('--clients', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=30.0, help='секунд')
+        parser.add_argument('--header', action='append', default=[],
+                            help='"Имя: значение", например Authorization или Cookie: sessionid=...')
+
+    def handle(self, *args, url='', clients=500, duration=30.0, header=(), **options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError('Нужен http:// URL')
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        headers = dict(h.split(':', 1) for h in header)
+        headers = {k.strip(): v.strip() for k, v in headers.items()}
+        timings, errors = [], []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(clients + 1)
+        deadline = [0.0]
+
+        def client():
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            local, failed = [], 0
+            start_barrier.wait()
+            while time.perf_counter() < deadline[0]:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+                    continue
+                local.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                timings.extend(local)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+        for t in threads:
+            t.start()
+        deadline[0] = time.perf_counter() + duration
+        start_barrier.wait()
+        for t in threads:
+            t.join()
+
+        if not timings:
+            raise CommandError(f'Ни одного успешного ответа, ошибок: {sum(errors)}')
+        timings.sort()
+        p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+        self.stdout.write(f'клиентов: {clients}, запросов: {len(timings)}, ошибок/не-200: {sum(errors)}')
+        self.stdout.write(f'rps: {len(timings) / duration:.0f}')
+        self.stdout.write(f'p50: {statistics.median(timings) * 1000:.1f} мс, p99: {p99 * 1000:.1f} мс')
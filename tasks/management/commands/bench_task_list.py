@@ -0,0 +1,46 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from tasks.models import Task
+from tasks.pagination import QueryPageSizePagination
+from tasks.serializers import TASK_FIELDS, TaskSerializer, task_rows_data
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает страницу списка задач через TaskSerializer и через быстрый путь из .values() '
+            '(запрос + сериализация + JSON). Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument('--page-sizes', default=f'10,{QueryPageSizePagination.max_page_size}')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, tasks=10000, page_sizes='', repeat=200, **options):
+        renderer = JSONRenderer()
+        qs = Task.objects.order_by('-created_at', '-id')
+        paths = [
+            ('TaskSerializer', lambda n: renderer.render(TaskSerializer(list(qs[:n]), many=True).data)),
+            ('values()', lambda n: renderer.render(task_rows_data(qs.values(*TASK_FIELDS)[:n]))),
+        ]
+        self.stdout.write(f"{'страница':>9} {'путь':<16} {'медиана, мс':>12} {'строк/с':>10}")
+        with transaction.atomic():
+            owner = User.objects.create_user(username='bench_tasks')
+            Task.objects.bulk_create([
+                Task(owner=owner if i % 2 else None, title=f'Задача {i}', description='описание ' * (i % 5),
+                     completed=i % 3 == 0) for i in range(tasks)], batch_size=5000)
+            for size in [int(s) for s in page_sizes.split(',')]:
+                outputs = {name: run(size) for name, run in paths}
+                if len(set(outputs.values())) != 1:
+                    raise CommandError(f'Быстрый путь расходится с TaskSerializer на странице {size}')
+                for name, run in paths:
+                    timings = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        run(size)
+                        timings.append(time.perf_counter() - start)
+                    median = statistics.median(timings)
+                    self.stdout.write(f'{size:>9} {name:<16} {median * 1000:>12.3f} {size / median:>10.0f}')
+            transaction.set_rollback(True)
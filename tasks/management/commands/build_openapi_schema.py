@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tasks import openapi
+
+
+class Command(BaseCommand):
+    help = 'Собирает схему OpenAPI (YAML и JSON, gzip) в OPENAPI_SCHEMA_DIR — запускается при деплое'
+
+    def handle(self, *args, **options):
+        for path in openapi.build():
+            self.stdout.write(f'{path} ({path.stat().st_size} байт)')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from tasks import blacklist
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ('Переносит еще действующие отзывы из таблиц token_blacklist в Redis '
+            'и пачками очищает OutstandingToken/BlacklistedToken')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--expired-only', action='store_true', help='Удалять только истекшие токены')
+
+    def handle(self, *args, batch_size=BATCH_SIZE, expired_only=False, **options):
+        now = timezone.now()
+        # сначала переносим отзывы, иначе удаление строк «воскресит» отозванные токены
+        moved = 0
+        rows = (BlacklistedToken.objects.filter(token__expires_at__gt=now)
+                .values_list('token__jti', 'token__expires_at').order_by('id'))
+        batch = []
+        for jti, expires_at in rows.iterator(chunk_size=batch_size):
+            batch.append((jti, expires_at.timestamp()))
+            if len(batch) >= batch_size:
+                moved += blacklist.add_many(batch)
+                batch = []
+        moved += blacklist.add_many(batch)
+        self.stdout.write(f'Перенесено в Redis: {moved}')
+
+        qs = OutstandingToken.objects.all()
+        if expired_only:
+            qs = qs.filter(expires_at__lte=now)
+        deleted = 0
+        while True:
+            # короткими пачками по id, чтобы не держать долгие блокировки; BlacklistedToken уходит каскадом
+            ids = list(qs.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+        self.stdout.write(f'Удалено токенов: {deleted}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from tasks import sync
+
+
+class Command(BaseCommand):
+    help = 'Удаляет надгробия задач старше срока хранения (запускать по cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, batch_size=5000, **options):
+        deleted = sync.prune_tombstones(batch_size=batch_size)
+        self.stdout.write(f'Удалено надгробий: {deleted}')
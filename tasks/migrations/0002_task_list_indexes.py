@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-created_at', '-id'], name='tasks_task_created'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='tasks_task_owner_created'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed', '-created_at', '-id'], name='tasks_task_completed_created'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 
 class Task(models.Model):
@@ -12,6 +13,33 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Под курсорную пагинацию (-created_at, -id) и фильтры owner / completed
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='tasks_task_created'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='tasks_task_owner_created'),
+            models.Index(fields=['completed', '-created_at', '-id'], name='tasks_task_completed_created'),
+            # Под /api/tasks/changes/
+            models.Index(fields=['updated_at', 'id'], name='tasks_task_updated'),
+            models.Index(fields=['owner', 'updated_at', 'id'], name='tasks_task_owner_updated'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class TaskTombstone(models.Model):
+    """ Журнал удалений для /api/tasks/changes/: клиент узнает, какие задачи убрать у себя """
+    task_id = models.BigIntegerField()
+    # без внешнего ключа: запись должна пережить и задачу, и ее владельца
+    owner_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tasks_tombstone_deleted'),
+            models.Index(fields=['owner_id', 'deleted_at', 'id'], name='tasks_tombstone_owner_deleted'),
+        ]
+
+    def __str__(self):
+        return f'{self.task_id} @ {self.deleted_at}'
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import threading
+from dataclasses import dataclass
+from importlib import import_module
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+# Схема OpenAPI собирается один раз — при деплое (manage.py build_openapi_schema) или лениво
+# при первом запросе в процессе — и отдается готовыми gzip-байтами со строгим ETag.
+# drf_spectacular импортируется только при сборке схемы и на страницах документации; в режиме
+# OPENAPI_PREBUILT (production_settings) его нет и в INSTALLED_APPS
+FORMATS = {
+    'yaml': ('application/vnd.oai.openapi; charset=utf-8', 'drf_spectacular.renderers.OpenApiYamlRenderer'),
+    'json': ('application/vnd.oai.openapi+json', 'drf_spectacular.renderers.OpenApiJsonRenderer'),
+}
+CACHE_CONTROL = 'public, max-age=86400'
+
+
+@dataclass(frozen=True)
+class _Schema:
+    compressed: bytes
+    digest: str
+
+
+_schemas = {}
+_lock = threading.Lock()
+
+
+def _path(fmt: str) -> Path:
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'schema.{fmt}.gz'
+
+
+def _import(dotted: str):
+    module, name = dotted.rsplit('.', 1)
+    return getattr(import_module(module), name)
+
+
+def render(fmt: str) -> bytes:
+    # то же, что отдает SpectacularAPIView, но без запроса
+    from drf_spectacular.openapi import AutoSchema
+    from drf_spectacular.settings import spectacular_settings
+    from rest_framework.settings import api_settings
+    # без DEFAULT_SCHEMA_CLASS от drf_spectacular (режим OPENAPI_PREBUILT) генератор не примет
+    # представления — на время сборки подставляем AutoSchema
+    previous = api_settings.DEFAULT_SCHEMA_CLASS
+    api_settings.DEFAULT_SCHEMA_CLASS = AutoSchema if not issubclass(previous, AutoSchema) else previous
+    try:
+        schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=True)
+    finally:
+        api_settings.DEFAULT_SCHEMA_CLASS = previous
+    return _import(FORMATS[fmt][1])().render(schema, renderer_context={})
+
+
+def build() -> list:
+    directory = Path(settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for fmt in FORMATS:
+        # mtime=0 — одинаковая схема дает одинаковые байты и тот же ETag на всех машинах
+        _path(fmt).write_bytes(gzip.compress(render(fmt), compresslevel=9, mtime=0))
+        written.append(_path(fmt))
+    return written
+
+
+def _load(fmt: str) -> _Schema:
+    schema = _schemas.get(fmt)
+    if schema is not None:
+        return schema
+    with _lock:
+        if fmt not in _schemas:
+            path = _path(fmt)
+            # в DEBUG собираем заново в каждом процессе — runserver перезапускается при правках
+            if path.exists() and not settings.DEBUG:
+                compressed = path.read_bytes()
+            else:
+                compressed = gzip.compress(render(fmt), compresslevel=9, mtime=0)
+            _schemas[fmt] = _Schema(compressed, hashlib.sha256(compressed).hexdigest()[:32])
+        return _schemas[fmt]
+
+
+def _accepts_gzip(header: str) -> bool:
+    # Accept-Encoding с весами: gzip;q=0 — отказ от gzip, * — любое кодирование
+    weights = {}
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def schema_view(request):
+    """ GET /api/schema/ — YAML по умолчанию, JSON при ?format=json или Accept: ...json """
+    fmt = request.GET.get('format')
+    if fmt not in FORMATS:
+        fmt = 'json' if 'json' in request.META.get('HTTP_ACCEPT', '') else 'yaml'
+    schema = _load(fmt)
+    gzipped = _accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    # строгий ETag у каждого кодирования свой
+    etag = f'"{schema.digest}-gzip"' if gzipped else f'"{schema.digest}"'
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    # If-None-Match: * совпадает с любой версией — схема есть всегда
+    if etags == ['*'] or etag in etags:
+        response = HttpResponseNotModified()
+    else:
+        body = schema.compressed if gzipped else gzip.decompress(schema.compressed)
+        response = HttpResponse(body, content_type=FORMATS[fmt][0])
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+
+def lazy_view(dotted: str, **initkwargs):
+    # Страницы Swagger/Redoc: класс из drf_spectacular импортируется при первом обращении
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = _import(dotted).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return wrapper
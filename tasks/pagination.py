@@ -1,6 +1,85 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# Начиная с такой оценки точный COUNT(*) не делаем
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_count(queryset):
+    # Оценка числа строк всей таблицы из статистики PostgreSQL (pg_class.reltuples), без прохода
+    # по таблице и без EXPLAIN. Для запросов с фильтрами оценка ненадежна — для них None
+    if not hasattr(queryset, 'query'):
+        return None
+    query = queryset.query
+    if query.where or query.distinct or query.is_sliced or len(query.alias_map) > 1:
+        return None
+    conn = connections[queryset.db]
+    if conn.vendor != 'postgresql':
+        return None
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 — таблицу еще ни разу не анализировали
+    return row[0] if row and row[0] >= 0 else None
+
+
+class _LookaheadPage(Page):
+    # Есть ли следующая страница, известно по лишней строке, а не по приблизительному count
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def estimate(self):
+        estimate = estimate_count(self.object_list)
+        return estimate if estimate is not None and estimate >= ESTIMATE_THRESHOLD else None
+
+    @cached_property
+    def count(self):
+        # оценка идет только в поле count ответа; границы страниц от нее не зависят
+        return self.estimate if self.estimate is not None else super().count
+
+    def validate_number(self, number):
+        if self.estimate is None:
+            return super().validate_number(number)
+        # номер за оценкой не отвергаем: планировщик мог недооценить таблицу,
+        # и такая страница на самом деле существует
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        if self.estimate is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return _LookaheadPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
 
 class QueryPageSizePagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TaskCursorPagination(CursorPagination):
+    """ ?pagination=cursor — без COUNT и OFFSET, глубина страницы не влияет на стоимость """
+    ordering = ('-created_at', '-id')
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
@@ -1,5 +1,10 @@
-from rest_framework import serializers
+from functools import lru_cache
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .blacklist import RedisRefreshToken
 from .models import Task
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -7,6 +12,52 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = ['id', 'title', 'description', 'completed', 'created_at', 'updated_at']
 
+# Быстрый путь для списков: строки из .values(*TASK_FIELDS) превращаются в тот же вывод,
+# что и TaskSerializer(many=True).data, без экземпляров модели и машинерии полей.
+# Преобразователи берутся из самих полей сериализатора; для дат — свернутый
+# DateTimeField.to_representation (часовой пояс + ISO 8601 с «Z»)
+TASK_FIELDS = tuple(TaskSerializer.Meta.fields)
+
+
+def _datetime_converter(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601 or hasattr(field, 'timezone'):
+        return field.to_representation
+    tz = field.default_timezone()
+
+    def convert(value):
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+@lru_cache(maxsize=16)
+def _converters(tz_name):
+    # tz_name — только ключ кэша: default_timezone() полей читает активный часовой пояс сам
+    converters = []
+    for name, field in TaskSerializer().fields.items():
+        if isinstance(field, serializers.DateTimeField):
+            converters.append((name, _datetime_converter(field)))
+        elif isinstance(field, (serializers.IntegerField, serializers.BooleanField)):
+            converters.append((name, None))
+        else:
+            converters.append((name, field.to_representation))
+    return tuple(converters)
+
+
+def task_rows_data(rows):
+    converters = _converters(timezone.get_current_timezone_name())
+    data = []
+    for row in rows:
+        item = {}
+        for name, convert in converters:
+            value = row[name]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     class Meta:
@@ -17,4 +68,12 @@ class RegisterSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(
             username=validated_data['username'],
             email=validated_data.get('email', ''),
-            password=validated_data['password'])
\ No newline at end of file
+            password=validated_data['password'])
+
+
+class RedisTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RedisRefreshToken
+
+
+class RedisTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RedisRefreshToken
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clinica.services import versions as versions_svc
+from .models import Task, TaskTombstone
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, **kwargs):
+    TaskTombstone.objects.create(task_id=instance.pk, owner_id=instance.owner_id)
+
+
+def task_version_scopes(task):
+    # список целиком, список владельца (?mine=1) и сама задача
+    return ['tasks', f'tasks:owner:{task.owner_id}' if task.owner_id else None, f'tasks:{task.pk}']
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_task_versions(sender, instance, **kwargs):
+    versions_svc.bump(*task_version_scopes(instance))
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from typing import Optional
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from clinica.services.pagination import decode_values, encode_values
+from .models import Task, TaskTombstone
+from .serializers import TaskSerializer
+
+# Дельта-синхронизация: задачи, у которых updated_at ушел дальше курсора, и надгробия удаленных.
+# Курсор хранит две позиции — (updated_at, id) по задачам и (deleted_at, id) по надгробиям —
+# и момент выдачи, по которому видно, не удалены ли уже нужные клиенту надгробия
+PAGE_SIZE = 500
+# Отдаем только изменения старше SETTLE_LAG: updated_at ставится до коммита, и транзакция,
+# закоммиченная чуть позже соседней, иначе оказалась бы позади уже выданного курсора
+SETTLE_LAG = timedelta(seconds=5)
+# Сколько хранятся надгробия; курсор старше — клиенту нужна полная пересинхронизация
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def _position(values) -> Optional[tuple]:
+    if not values or len(values) != 2 or not isinstance(values[1], int):
+        return None
+    at = parse_datetime(values[0]) if isinstance(values[0], str) else None
+    return (at, values[1]) if at is not None else None
+
+
+def _after(qs, field: str, position: Optional[tuple]):
+    if position is None:
+        return qs
+    at, pk = position
+    return qs.filter(Q(**{f'{field}__gt': at}) | Q(**{field: at, 'id__gt': pk}))
+
+
+def _page(qs, field: str, position: Optional[tuple], horizon, size: int):
+    qs = _after(qs.filter(**{f'{field}__lt': horizon}), field, position).order_by(field, 'id')
+    items = list(qs[:size + 1])
+    has_more = len(items) > size
+    items = items[:size]
+    if items:
+        position = (getattr(items[-1], field), items[-1].id)
+    return items, position, has_more
+
+
+def _encode(position: Optional[tuple]) -> Optional[list]:
+    return [position[0].isoformat(), position[1]] if position else None
+
+
+def changes(cursor: Optional[str], owner=None, size: int = PAGE_SIZE) -> dict:
+    # ValueError — курсор не разобрать, CursorExpired — надгробия за этот период уже удалены
+    task_pos = tomb_pos = None
+    if cursor:
+        values = decode_values(cursor)
+        if not values or len(values) != 3:
+            raise ValueError('invalid cursor')
+        task_pos, tomb_pos = _position(values[0]), _position(values[1])
+        issued = parse_datetime(values[2]) if isinstance(values[2], str) else None
+        if (values[0] and task_pos is None) or (values[1] and tomb_pos is None) or issued is None:
+            raise ValueError('invalid cursor')
+        if issued < timezone.now() - TOMBSTONE_RETENTION:
+            raise CursorExpired()
+
+    horizon = timezone.now() - SETTLE_LAG
+    tasks = Task.objects.all()
+    tombstones = TaskTombstone.objects.all()
+    if owner is not None:
+        tasks = tasks.filter(owner=owner)
+        tombstones = tombstones.filter(owner_id=owner.pk)
+    changed, task_pos, more_tasks = _page(tasks, 'updated_at', task_pos, horizon, size)
+    # первая синхронизация начинается с полного списка — надгробия до нее клиенту не нужны
+    if cursor:
+        deleted, tomb_pos, more_tombs = _page(tombstones, 'deleted_at', tomb_pos, horizon, size)
+    else:
+        deleted, more_tombs = [], False
+        last = tombstones.filter(deleted_at__lt=horizon).order_by('-deleted_at', '-id').first()
+        tomb_pos = (last.deleted_at, last.id) if last else None
+    return {
+        'changed': TaskSerializer(changed, many=True).data,
+        'deleted': [{'id': t.task_id, 'deleted_at': t.deleted_at} for t in deleted],
+        'cursor': encode_values(_encode(task_pos), _encode(tomb_pos), horizon.isoformat()),
+        'has_more': more_tasks or more_tombs,
+    }
+
+
+def prune_tombstones(batch_size: int = 5000) -> int:
+    horizon = timezone.now() - TOMBSTONE_RETENTION
+    total = 0
+    while True:
+        ids = list(TaskTombstone.objects.filter(deleted_at__lt=horizon).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += TaskTombstone.objects.filter(id__in=ids).delete()[0]
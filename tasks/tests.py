@@ -1,3 +1,215 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from clinica.services import versions as versions_svc
+
+from . import openapi, pagination
+from .models import Task
+from .serializers import TASK_FIELDS, TaskSerializer, task_rows_data
+
+
+class EstimatedCountPaginationTests(TestCase):
+    def setUp(self):
+        # сброс закэшированного пользователя сессии (clinica.auth_backends) идет через on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='pager', password='x')
+        Task.objects.bulk_create([Task(title=f'Задача {i}', owner=self.user if i % 2 else None) for i in range(30)])
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_filtered_queryset_is_not_estimated(self):
+        self.assertIsNone(pagination.estimate_count(Task.objects.filter(completed=True)))
+        self.assertIsNone(pagination.estimate_count(Task.objects.filter(owner=self.user).values('id')))
+
+    def test_underestimated_count_does_not_hide_real_pages(self):
+        # планировщик думает, что строк 10, а их 30: третья страница все равно отдается
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 1), \
+                mock.patch.object(pagination, 'estimate_count', return_value=10):
+            second = self.client.get('/api/tasks/', {'page': 2})
+            third = self.client.get('/api/tasks/', {'page': 3})
+            beyond = self.client.get('/api/tasks/', {'page': 4})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['count'], 10)
+        self.assertIsNotNone(second.data['next'])
+        self.assertEqual(len(third.data['results']), 10)
+        self.assertIsNone(third.data['next'])
+        self.assertEqual((beyond.status_code, beyond.data['results']), (200, []))
+
+    def test_small_or_filtered_lists_use_exact_count(self):
+        response = self.client.get('/api/tasks/', {'owner': self.user.id, 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(self.client.get('/api/tasks/', {'owner': self.user.id, 'page': 3}).status_code, 404)
+
+
+class OpenApiSchemaViewTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        openapi._schemas.clear()
+        self.addCleanup(openapi._schemas.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(username='schema', password='x')
+        self.client.force_login(user)
+
+    def test_gzip_only_when_accepted_with_positive_weight(self):
+        plain = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertTrue(plain.content.startswith(b'openapi:'))
+        for header in ('gzip', 'br, gzip;q=0.5', '*'):
+            response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response['Content-Encoding'], 'gzip', header)
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertNotIn('Content-Encoding', self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='*, gzip;q=0'))
+
+    def test_not_modified_for_matching_etag_or_star(self):
+        etag = self.client.get('/api/schema/', {'format': 'json'})['ETag']
+        self.assertEqual(self.client.get('/api/schema/', {'format': 'json'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/schema/', HTTP_IF_NONE_MATCH='*').status_code, 304)
+        self.assertEqual(self.client.get('/api/schema/', {'format': 'json'}, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_render_without_spectacular_schema_class(self):
+        # режим OPENAPI_PREBUILT: DEFAULT_SCHEMA_CLASS остается по умолчанию DRF
+        with override_settings(REST_FRAMEWORK={}):
+            schema = json.loads(openapi.render('json'))
+        self.assertIn('/api/tasks/', schema['paths'])
+
+
+class AsyncTaskViewsTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='async', password='x')
+        self.tasks = Task.objects.bulk_create([Task(title=f'Задача {i}', owner=self.user) for i in range(3)])
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+
+    async def test_list_pages_by_next_link(self):
+        client = AsyncClient()
+        first = await client.get('/api/async/tasks/', {'page_size': 2}, **self.auth)
+        self.assertEqual(first.status_code, 200)
+        body = first.json()
+        self.assertEqual(set(body), {'next', 'results'})
+        self.assertEqual(len(body['results']), 2)
+        self.assertTrue(body['next'].startswith('http://testserver/api/async/tasks/?'))
+        second = (await client.get(body['next'], **self.auth)).json()
+        self.assertIsNone(second['next'])
+        mine = await client.get('/api/async/tasks/', {'mine': '1'})
+        self.assertEqual(mine.status_code, 401)
+        seen = [row['id'] for row in body['results'] + second['results']]
+        self.assertEqual(sorted(seen), sorted(task.id for task in self.tasks))
+
+    async def test_create_requires_valid_token(self):
+        client = AsyncClient()
+        payload = json.dumps({'title': 'Новая'})
+        anonymous = await client.post('/api/async/tasks/', payload, content_type='application/json')
+        self.assertEqual(anonymous.status_code, 401)
+        forged = await client.post('/api/async/tasks/', payload, content_type='application/json',
+                                   headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(forged.status_code, 401)
+        created = await client.post('/api/async/tasks/', payload, content_type='application/json', **self.auth)
+        self.assertEqual(created.status_code, 201)
+        task = await Task.objects.aget(pk=created.json()['id'])
+        self.assertEqual((task.title, task.owner_id), ('Новая', self.user.id))
+
+    async def test_detail(self):
+        client = AsyncClient()
+        found = await client.get(f'/api/async/tasks/{self.tasks[0].id}/', **self.auth)
+        self.assertEqual((found.status_code, found.json()['title']), (200, self.tasks[0].title))
+        missing = await client.get('/api/async/tasks/0/', **self.auth)
+        self.assertEqual(missing.status_code, 404)
+
+
+class TaskVersionTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='versions', password='x')
+            self.task = Task.objects.create(title='Исходная', owner=self.user)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+        self.client.force_authenticate(self.user)
+
+    def _revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_not_modified_until_task_changes(self):
+        url = f'/api/tasks/{self.task.id}/'
+        detail_etag = self.client.get(url)['ETag']
+        list_etag = self.client.get('/api/tasks/')['ETag']
+        self.assertEqual(self._revalidate(url, detail_etag), 304)
+        self.assertEqual(self._revalidate('/api/tasks/', list_etag), 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.patch(url, {'title': 'Другая'}, format='json').status_code, 200)
+        self.assertEqual(self._revalidate(url, detail_etag), 200)
+        self.assertEqual(self._revalidate('/api/tasks/', list_etag), 200)
+
+    def test_etag_and_vary_follow_negotiated_format(self):
+        url = f'/api/tasks/{self.task.id}/'
+        json_response = self.client.get(url, HTTP_ACCEPT='application/json')
+        html_response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertNotEqual(json_response['ETag'], html_response['ETag'])
+        self.assertIn('Accept', json_response['Vary'])
+        stale = self.client.get(url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=json_response['ETag'])
+        self.assertEqual((stale.status_code, stale['Content-Type']), (200, 'text/html; charset=utf-8'))
+        fresh = self.client.get('/api/tasks/', HTTP_ACCEPT='application/json')
+        revalidated = self.client.get('/api/tasks/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=fresh['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn('Accept', revalidated['Vary'])
+
+    def test_batch_bumps_versions(self):
+        url = f'/api/tasks/{self.task.id}/'
+        detail_etag = self.client.get(url)['ETag']
+        mine_etag = self.client.get('/api/tasks/', {'mine': 1})['ETag']
+        operations = [{'op': 'patch', 'id': self.task.id, 'data': {'title': 'Пакет'}},
+                      {'op': 'create', 'data': {'title': 'Новая'}}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/tasks/batch/', operations, format='json').status_code, 200)
+        self.assertEqual(self._revalidate(url, detail_etag), 200)
+        self.assertEqual(self.client.get('/api/tasks/', {'mine': 1}, HTTP_IF_NONE_MATCH=mine_etag).status_code, 200)
+
+    def test_unknown_id_does_not_leave_permanent_key(self):
+        scope = f'tasks:{Task.objects.order_by("-id").values_list("id", flat=True).first() + 1000}'
+        versions_svc.get_many(scope)
+        ttl = versions_svc.cache.ttl(versions_svc._key(scope))
+        self.assertTrue(0 < ttl <= versions_svc.VERSION_TTL, ttl)
+
+
+class TaskRowsDataTests(TestCase):
+    def setUp(self):
+        precise = Task.objects.create(title='С микросекундами', description='Описание')
+        whole = Task.objects.create(title='Ровно', completed=True)
+        Task.objects.filter(pk=precise.pk).update(created_at=datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+                                                  updated_at=datetime(2024, 6, 30, 23, 59, 59, 1, tzinfo=dt_timezone.utc))
+        Task.objects.filter(pk=whole.pk).update(created_at=datetime(2024, 1, 2, 21, 0, tzinfo=dt_timezone.utc),
+                                                updated_at=datetime(2024, 1, 2, 21, 0, tzinfo=dt_timezone.utc))
+
+    def _render_both(self):
+        render = JSONRenderer().render
+        qs = Task.objects.order_by('id')
+        # даты в БД обязательны — None проверяем на несохраненной задаче
+        unsaved = [Task(id=0, title='Без дат', description='', completed=False)]
+        fast = render(task_rows_data(list(qs.values(*TASK_FIELDS)) + [{f: getattr(t, f) for f in TASK_FIELDS} for t in unsaved]))
+        slow = render(TaskSerializer(list(qs) + unsaved, many=True).data)
+        return fast, slow
+
+    def test_values_path_matches_serializer_bytes(self):
+        # _converters кэшируется по имени часового пояса — проверяем оба пояса в одном процессе
+        with override_settings(USE_TZ=True):
+            fast, slow = self._render_both()
+            self.assertEqual(fast, slow)
+            self.assertIn(b'"2024-01-02T03:04:05.678901Z"', fast)
+            self.assertIn(b'"created_at":null', fast)
+            with timezone.override('Europe/Moscow'):
+                fast, slow = self._render_both()
+                self.assertEqual(fast, slow)
+                self.assertIn(b'"2024-01-03T00:00:00+03:00"', fast)
@@ -1,19 +1,96 @@
+from django.utils.cache import patch_vary_headers
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from clinica.services import ratelimit as ratelimit_svc
+from clinica.services import versions as versions_svc
+from . import batch as batch_ops
+from . import sync
+from .blacklist import RedisRefreshToken
 from .models import Task
-from .serializers import TaskSerializer, RegisterSerializer
+from .pagination import TaskCursorPagination
+from .serializers import TASK_FIELDS, TaskSerializer, RegisterSerializer, task_rows_data
 
 
 class TaskViewSet(viewsets.ModelViewSet):
-    """ GET /api/tasks/ — список (пагинация) POST /api/tasks/ — создать (только для аутентифицированных) GET /api/tasks/{id}/ — получить PUT/PATCH /api/tasks/{id}/— обновить (только для аутентифицированных) DELETE /api/tasks/{id}/ — удалить (только для аутентифицированных) """
-    queryset = Task.objects.all().order_by('-created_at')
+    """ GET /api/tasks/ — список (пагинация; ?pagination=cursor, фильтры ?owner=, ?completed=, ?mine=1) POST /api/tasks/ — создать (только для аутентифицированных) GET /api/tasks/{id}/ — получить PUT/PATCH /api/tasks/{id}/— обновить (только для аутентифицированных) DELETE /api/tasks/{id}/ — удалить (только для аутентифицированных) """
+    queryset = Task.objects.all().order_by('-created_at', '-id')
     serializer_class = TaskSerializer
     permission_classes = [permissions.AllowAny]
 
+    @property
+    def paginator(self):
+        # ?pagination=cursor — курсор по (created_at, id); без параметра — прежние номера страниц
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = TaskCursorPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def _etag(self, request):
+        # из счетчиков версий в Redis (tasks/signals.py), без запросов в БД; у JSON и Browsable API
+        # одни и те же данные, но разные байты — формат входит в ETag
+        fmt = request.accepted_renderer.format
+        if self.action == 'retrieve':
+            return versions_svc.etag(f'tasks:{self.kwargs[self.lookup_field]}', extra=(fmt,))
+        if request.query_params.get('mine') in ('1', 'true') and request.user.is_authenticated:
+            return versions_svc.etag(f'tasks:owner:{request.user.pk}', extra=(request.user.pk, request.GET.urlencode(), fmt))
+        return versions_svc.etag('tasks', extra=(request.GET.urlencode(), fmt))
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        etag = self._etag(request)
+        if versions_svc.not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def _list(self, request, *args, **kwargs):
+        # Быстрый путь: словари из .values() вместо моделей и TaskSerializer, вывод тот же байт в байт
+        queryset = self.filter_queryset(self.get_queryset()).values(*TASK_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(task_rows_data(page))
+        return Response(task_rows_data(queryset))
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, self._list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != 'list':
+            return qs
+        params = self.request.query_params
+        # ?mine=1 — только задачи вызывающего
+        if params.get('mine') in ('1', 'true'):
+            if not self.request.user.is_authenticated:
+                raise NotAuthenticated()
+            qs = qs.filter(owner=self.request.user)
+        owner = params.get('owner')
+        if owner:
+            if not owner.isdigit():
+                raise ValidationError({'owner': 'Ожидается id пользователя'})
+            qs = qs.filter(owner_id=int(owner))
+        completed = params.get('completed')
+        if completed:
+            if completed not in ('true', 'false', '1', '0'):
+                raise ValidationError({'completed': 'Ожидается true или false'})
+            qs = qs.filter(completed=completed in ('true', '1'))
+        return qs
+
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'batch']:
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
@@ -22,6 +99,27 @@ class TaskViewSet(viewsets.ModelViewSet):
         owner = self.request.user if self.request.user.is_authenticated else None
         serializer.save(owner=owner)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """ POST /api/tasks/batch/ — пачка create/patch/delete одним запросом и одной транзакцией, результат по каждой операции """
+        code, results = batch_ops.apply(request.data, request.user)
+        return Response(results, status=code)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """ GET /api/tasks/changes/?since=<cursor> — измененные задачи и надгробия удаленных после курсора; ?mine=1 — только свои """
+        owner = None
+        if request.query_params.get('mine') in ('1', 'true'):
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            owner = request.user
+        try:
+            return Response(sync.changes(request.query_params.get('since'), owner=owner))
+        except ValueError:
+            raise ValidationError({'since': 'Некорректный курсор'})
+        except sync.CursorExpired:
+            return Response({'detail': 'Курсор устарел, нужна полная синхронизация'}, status=status.HTTP_410_GONE)
+
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -41,8 +139,17 @@ class LogoutView(APIView):
         if not refresh:
             return Response({'detail': 'Refresh token is required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            token = RefreshToken(refresh)
+            token = RedisRefreshToken(refresh)
             token.blacklist()
         except Exception:
             return Response({'detail': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_205_RESET_CONTENT)
+
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """ POST /api/auth/token/ — как TokenObtainPairView, но лишние попытки по никнейму и IP отклоняются (429 + Retry-After) до проверки пароля """
+    def post(self, request, *args, **kwargs):
+        retry_after = ratelimit_svc.check_login(str(request.data.get('username', '')), ratelimit_svc.client_ip(request))
+        if retry_after:
+            return Response({'detail': 'Too many login attempts'}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+        return super().post(request, *args, **kwargs)